@@ -0,0 +1,169 @@
+"""
+Micro-benchmarks for the CPU bound paths of the client.
+
+Usage:
+    python benchmarks/bench.py [--sizes 1000,100000,1000000] [--only xliff]
+
+Every benchmark is timed on its own and then run a second time under
+tracemalloc to report the peak memory it allocated.
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unbabel.api import UnbabelApi  # noqa: E402
+from unbabel.bulk import BatchResult  # noqa: E402
+from unbabel.codec import JsonCodec, get_default_codec  # noqa: E402
+from unbabel.xliff_converter import (  # noqa: E402
+    generate_xliff, get_dictionary_from_xliff)
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def translation_json(i):
+    return {
+        "uid": "%010x" % i,
+        "text": "This is the text number %d to translate" % i,
+        "translatedText": "Este é o texto número %d para traduzir" % i,
+        "source_language": "en",
+        "target_language": "pt",
+        "status": "completed",
+        "price": 10,
+        "text_format": "text",
+        "topics": ["politics"],
+        "translators": [{"first_name": "Ana", "last_name": "Silva",
+                         "picture_url": "", "profile_url": ""}],
+    }
+
+
+def entries(n):
+    return dict(("id-%d" % i, "This house number %d is yellow" % i)
+                for i in range(n))
+
+
+def api():
+    return UnbabelApi("user", "key")
+
+
+@benchmark
+def generate_xliff_bench(n):
+    data = entries(n)
+    return lambda: generate_xliff(data, "en", "pt")
+
+
+@benchmark
+def get_dictionary_from_xliff_bench(n):
+    xliff = generate_xliff(entries(n), "en", "pt").encode("utf-8")
+    return lambda: get_dictionary_from_xliff(io.BytesIO(xliff))
+
+
+@benchmark
+def build_translation_objects(n):
+    client = api()
+    objects = [translation_json(i) for i in range(n)]
+    return lambda: [client._build_translation_object(o) for o in objects]
+
+
+@benchmark
+def build_mt_translation_objects(n):
+    client = api()
+    objects = [translation_json(i) for i in range(n)]
+    return lambda: [client._build_mt_translation_object(o) for o in objects]
+
+
+@benchmark
+def bulk_payload(n):
+    client = api()
+    # Only the payload construction is measured, batches are not sent.
+    client._post_bulk_batch = lambda start, items: BatchResult(
+        start, len(items), [])
+    items = [{"text": "Text number %d" % i, "target_language": "pt",
+              "source_language": "en", "tone": "Formal"} for i in range(n)]
+    return lambda: client.post_bulk_translations(items, report=True)
+
+
+@benchmark
+def json_encode(n):
+    body = {"objects": [translation_json(i) for i in range(n)]}
+    return lambda: json.dumps(body).encode("utf-8")
+
+
+@benchmark
+def json_decode(n):
+    body = json.dumps({"objects": [translation_json(i) for i in range(n)]})
+    body = body.encode("utf-8")
+    return lambda: json.loads(body)
+
+
+@benchmark
+def codec_encode(n):
+    codec = get_default_codec()
+    body = {"objects": [translation_json(i) for i in range(n)]}
+    return lambda: codec.dumps(body)
+
+
+@benchmark
+def codec_decode(n):
+    codec = get_default_codec()
+    body = JsonCodec().dumps(
+        {"objects": [translation_json(i) for i in range(n)]})
+    return lambda: codec.loads(body)
+
+
+def measure(setup, n):
+    run = setup(n)
+    gc.collect()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated number of items")
+    parser.add_argument("--only", default="",
+                        help="run only benchmarks whose name contains this")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print("json codec: %s" % get_default_codec().name)
+    print("%-32s %9s %10s %14s %11s" % (
+        "benchmark", "items", "seconds", "items/s", "peak MiB"))
+    for setup in BENCHMARKS:
+        name = setup.__name__.replace("_bench", "")
+        if args.only not in name:
+            continue
+        for n in sizes:
+            elapsed, peak = measure(setup, n)
+            print("%-32s %9d %10.4f %14.0f %11.2f" % (
+                name, n, elapsed, n / elapsed if elapsed else float("inf"),
+                peak / 1024.0 / 1024.0))
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
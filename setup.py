@@ -9,9 +9,15 @@ setup(name='unbabel-py',
       package_dir={'unbabel': 'unbabel', },
       install_requires=[
           'requests',
-          'beautifulsoup4',
           'six',
       ],
+      extras_require={
+          'fast': ['orjson'],
+      },
+      entry_points={
+          'console_scripts': ['unbabel-xliff = unbabel.cli:main'],
+      },
+      python_requires='>=3.7',
       tests_require=[
           'requests_mock',
       ],
@@ -21,5 +27,7 @@ setup(name='unbabel-py',
           'Development Status :: 4 - Beta',
           'Intended Audience :: Developers',
           'Programming Language :: Python ',
+          'Programming Language :: Python :: 3',
+          'Programming Language :: Python :: 3 :: Only',
           'Topic :: Text Processing'
       ])
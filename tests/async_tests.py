@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import unittest
+from timeit import default_timer
+
+import requests_mock
+
+from unbabel.api import Translation, Topic, UnbabelApi
+from unbabel.async_api import AsyncUnbabelApi
+
+
+class TestAsyncUnbabelAPI(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    @requests_mock.Mocker()
+    def test_concurrent_get_translation(self, m):
+        for uid in ('a', 'b', 'c'):
+            m.get('/tapi/v2/translation/{}/'.format(uid), json={
+                "uid": uid,
+                "text": "Hello World",
+                "status": "completed",
+                "source_language": "en",
+                "target_language": "pt",
+            })
+
+        async def fetch():
+            async with AsyncUnbabelApi('user', 'key',
+                                       max_concurrency=2) as api:
+                return await asyncio.gather(
+                    *[api.get_translation(uid) for uid in ('a', 'b', 'c')])
+
+        translations = self.run_async(fetch())
+        self.assertEqual([t.uid for t in translations], ['a', 'b', 'c'])
+        self.assertTrue(all(isinstance(t, Translation) for t in translations))
+
+    @requests_mock.Mocker()
+    def test_post_translations_and_topics(self, m):
+        m.post('/tapi/v2/translation/', status_code=201, json={
+            "uid": "x1",
+            "text": "Hello World",
+            "status": "new",
+            "price": 10,
+        })
+        m.get('/tapi/v2/topic/', json={
+            "objects": [{"topic": {"name": "politics"}}]})
+
+        async def run():
+            async with AsyncUnbabelApi('user', 'key') as api:
+                translation = await api.post_translations(
+                    text="Hello World", target_language="pt")
+                topics = await api.get_topics()
+                return translation, topics
+
+        translation, topics = self.run_async(run())
+        self.assertEqual(translation.uid, 'x1')
+        self.assertEqual(translation.price, 10)
+        self.assertIsInstance(topics[0], Topic)
+        self.assertEqual(m.request_history[0].json(),
+                         {"text": "Hello World", "target_language": "pt",
+                          "text_format": "text"})
+
+    @requests_mock.Mocker()
+    def test_identical_reads_are_coalesced(self, m):
+        m.get('/tapi/v2/translation/a/', json={"uid": "a", "text": "x"})
+
+        async def fetch():
+            async with AsyncUnbabelApi('user', 'key',
+                                       single_flight=True) as api:
+                results = await asyncio.gather(
+                    *[api.get_translation('a') for _ in range(5)])
+                return results, api.single_flight.stats()
+
+        results, stats = self.run_async(fetch())
+        self.assertEqual([t.uid for t in results], ['a'] * 5)
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(stats, {'calls': 5, 'coalesced': 4})
+
+    def test_close_does_not_block_the_loop(self):
+        release = threading.Event()
+
+        async def run():
+            api = AsyncUnbabelApi('user', 'key')
+            api._executor.submit(release.wait, 5)
+
+            async def unblock():
+                await asyncio.sleep(0.01)
+                release.set()
+
+            start = default_timer()
+            await asyncio.gather(api.close(), unblock())
+            return default_timer() - start
+
+        self.assertLess(self.run_async(run()), 2)
+
+    def test_close_leaves_a_given_api_open(self):
+        api = UnbabelApi('user', 'key')
+        closed = []
+        api.close = lambda: closed.append(api)
+
+        async def run():
+            async with AsyncUnbabelApi('user', 'key', api=api):
+                pass
+            async with AsyncUnbabelApi('user', 'key') as owned:
+                owned.api.close = lambda: closed.append(owned.api)
+            return owned.api
+
+        owned = self.run_async(run())
+        self.assertEqual(closed, [owned])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests_mock
+
+from unbabel.api import UnbabelApi
+from unbabel.cache import ReferenceCache
+
+LANGUAGE_PAIRS = {"objects": [{
+    "lang_pair": {
+        "source_language": {"name": "Portuguese", "shortname": "pt"},
+        "target_language": {"name": "English", "shortname": "en"}
+    }
+}]}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.clock = Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_serves_stale_value_while_refreshing(self):
+        cache = ReferenceCache(ttl=10, clock=self.clock)
+        values = iter([1, 2])
+        self.assertEqual(cache.get('k', lambda: next(values)), 1)
+        self.assertEqual(cache.get('k', lambda: next(values)), 1)
+
+        self.clock.now += 10
+        self.assertEqual(cache.get('k', lambda: next(values)), 1)
+        for _ in range(100):
+            if 'k' not in cache._refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get('k', self.fail), 2)
+
+    def test_disk_entries_are_shared(self):
+        ReferenceCache(path=self.path, clock=self.clock).get(
+            'k', lambda: {"objects": []})
+        other = ReferenceCache(path=self.path, clock=self.clock)
+        self.assertEqual(other.get('k', self.fail), {"objects": []})
+
+    def test_uncacheable_values_are_not_stored(self):
+        cache = ReferenceCache(clock=self.clock)
+        cache.get('k', lambda: {'error': 'x'}, lambda v: 'error' not in v)
+        self.assertEqual(cache.get('k', lambda: 3), 3)
+
+    @requests_mock.Mocker()
+    def test_api_uses_cache_for_language_pairs(self, m):
+        m.get('/tapi/v2/language_pair/', json=LANGUAGE_PAIRS)
+        api = UnbabelApi('user', 'key', cache=ReferenceCache(
+            path=self.path, clock=self.clock))
+
+        self.assertEqual(len(api.get_language_pairs()), 1)
+        self.assertTrue(api.is_supported_pair('pt', 'en'))
+        self.assertFalse(api.is_supported_pair('en', 'pt'))
+        self.assertEqual(m.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_supported_pairs_are_kept_without_cache(self, m):
+        m.get('/tapi/v2/language_pair/', json=LANGUAGE_PAIRS)
+        api = UnbabelApi('user', 'key')
+
+        self.assertTrue(api.is_supported_pair('pt', 'en'))
+        self.assertFalse(api.is_supported_pair('en', 'pt'))
+        self.assertEqual(m.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import threading
+import unittest
+
+import requests
+
+from unbabel.api import MTTranslation, Translation
+from unbabel.callbacks import CallbackReceiver
+
+
+class TestCallbackReceiver(unittest.TestCase):
+
+    def test_wsgi_server_resolves_futures_and_handlers(self):
+        receiver = CallbackReceiver()
+        handled = []
+        called = threading.Event()
+
+        @receiver.add_handler
+        def handler(translation):
+            handled.append(translation)
+            called.set()
+
+        future = receiver.future('abc')
+        server = receiver.serve()
+        try:
+            response = requests.post(
+                'http://127.0.0.1:%s/' % server.server_port,
+                data={'uid': 'abc', 'status': 'completed',
+                      'translated_text': u'Olá'})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(response.status_code, 200)
+        translation = future.result(timeout=1)
+        self.assertIsInstance(translation, Translation)
+        self.assertEqual(translation.translation, u'Olá')
+        self.assertTrue(called.wait(1))
+        self.assertEqual(handled, [translation])
+        receiver.close()
+
+    def test_unclaimed_results_are_bounded(self):
+        receiver = CallbackReceiver(max_results=2)
+        waited = receiver.future('a')
+        for uid in ('a', 'b', 'c', 'd'):
+            receiver.dispatch(Translation(uid=uid, status='completed'))
+        self.assertEqual(waited.result(timeout=1).uid, 'a')
+        self.assertEqual(receiver._futures, {})
+        self.assertEqual(list(receiver._results), ['c', 'd'])
+        self.assertEqual(receiver.future('d').result(timeout=1).uid, 'd')
+        self.assertFalse(receiver.future('b').done())
+        receiver.close()
+
+    def test_wait_after_timeout_gets_the_callback(self):
+        receiver = CallbackReceiver()
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await receiver.wait('abc', timeout=0.05)
+            receiver.dispatch(Translation(uid='abc', status='completed'))
+            return await receiver.wait('abc', timeout=1)
+
+        self.assertEqual(asyncio.run(run()).uid, 'abc')
+        self.assertFalse(receiver.future('abc').cancelled())
+        receiver.close()
+
+    def test_cancelled_futures_are_replaced(self):
+        receiver = CallbackReceiver()
+        receiver.future('abc').cancel()
+        self.assertFalse(receiver.future('abc').cancelled())
+        receiver.future('abc').cancel()
+        receiver.dispatch(Translation(uid='abc', status='completed'))
+        self.assertEqual(receiver.future('abc').result(timeout=1).uid, 'abc')
+        receiver.close()
+
+    def test_async_server_parses_json_payloads(self):
+        receiver = CallbackReceiver(mt=True)
+
+        async def run():
+            server = await receiver.serve_async()
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = json.dumps({'uid': 'x', 'text': 'Hi',
+                               'status': 'completed'}).encode('utf-8')
+            writer.write(b'POST / HTTP/1.1\r\nContent-Type: application/json'
+                         b'\r\nContent-Length: %d\r\n\r\n' % len(body) + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            translation = await receiver.wait('x', timeout=1)
+            server.close()
+            await server.wait_closed()
+            return status_line, translation
+
+        status_line, translation = asyncio.run(run())
+        self.assertIn(b'200 OK', status_line)
+        self.assertIsInstance(translation, MTTranslation)
+        self.assertEqual(translation.text, 'Hi')
+        receiver.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
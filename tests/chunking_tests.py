@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from unbabel.chunking import join_chunks, split_document
+from unbabel.xliff_converter import generate_xliff, get_dictionary_from_xliff
+
+
+class TestChunking(unittest.TestCase):
+
+    def test_text_chunks_are_bounded_and_rejoin(self):
+        text = (u"  Olá mundo. Como estás? Bem!\n\n"
+                u"Segundo parágrafo com uma frase muito comprida sem "
+                u"pontuação nenhuma\n")
+        chunks, separators = split_document(text, max_chars=25)
+        self.assertTrue(all(len(chunk) <= 25 for chunk in chunks))
+        self.assertEqual(chunks[:2], [u"Olá mundo. Como estás?", u"Bem!"])
+        self.assertEqual(separators[0], u"  ")
+        self.assertEqual(join_chunks(chunks, separators), text)
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_document("Hello. World."),
+                         (["Hello. World."], ["", ""]))
+
+    def test_html_keeps_markup_balanced(self):
+        html = (u'<div class="doc"><p>One. Two.</p>\n'
+                u'<p>Three <b>bold. text</b> four. Five.</p></div>')
+        chunks, separators = split_document(html, 'html', max_chars=30)
+        self.assertEqual(chunks, [u'<p>One. Two.</p>',
+                                  u'Three <b>bold. text</b> four.',
+                                  u'Five.'])
+        self.assertEqual(separators, [u'<div class="doc">', u'\n<p>', u' ',
+                                      u'</p></div>'])
+        self.assertEqual(join_chunks(chunks, separators, 'html'), html)
+
+    def test_xliff_is_split_between_units(self):
+        entries = dict(('k%s' % i, 'Text %s' % i) for i in range(6))
+        xliff = generate_xliff(entries, 'en', 'pt')
+        chunks, separators = split_document(xliff, 'xliff',
+                                            max_chars=len(xliff) - 100)
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks:
+            self.assertTrue(set(get_dictionary_from_xliff(chunk)) <
+                            set(entries))
+        self.assertEqual(join_chunks(chunks, separators, 'xliff'), xliff)
+
+
+if __name__ == "__main__":
+    unittest.main()
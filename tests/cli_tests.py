@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from six import StringIO
+
+from unbabel import cli
+from unbabel.xliff_converter import iter_xliff_units
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.strings = os.path.join(self.root, 'strings')
+        os.makedirs(os.path.join(self.strings, 'app'))
+        with io.open(os.path.join(self.strings, 'app', 'messages.json'), 'w',
+                     encoding='utf-8') as f:
+            f.write(u'{"hello": "Hello <b>World</b>", "bye": "Até já"}')
+        with io.open(os.path.join(self.strings, 'labels.properties'), 'w',
+                     encoding='utf-8') as f:
+            f.write(u'# labels\n\nsave = Save\ncancel=Cancel\n')
+        with io.open(os.path.join(self.strings, 'notes.md'), 'w',
+                     encoding='utf-8') as f:
+            f.write(u'not converted')
+
+    def run_cli(self, *args):
+        out = StringIO()
+        files, total_bytes, _, failures = cli.run(
+            args[0], args[1], args[2], args[3], workers=2, out=out)
+        self.assertEqual(failures, [])
+        return files, total_bytes, out.getvalue().splitlines()
+
+    def test_round_trip(self):
+        xliff_dir = os.path.join(self.root, 'xliff')
+        files, total_bytes, lines = self.run_cli(
+            'to-xliff', self.strings, xliff_dir,
+            {'source_language': 'en', 'target_language': 'pt'})
+        self.assertEqual(files, 2)
+        self.assertTrue(total_bytes > 0)
+        self.assertEqual([line.split(' -> ')[1] for line in lines], [
+            os.path.join(xliff_dir, 'app', 'messages.json.xlf'),
+            os.path.join(xliff_dir, 'labels.properties.xlf')])
+        units = list(iter_xliff_units(
+            os.path.join(xliff_dir, 'labels.properties.xlf')))
+        self.assertEqual(units, [('save', 'Save', None),
+                                 ('cancel', 'Cancel', None)])
+
+        back_dir = os.path.join(self.root, 'back')
+        files, _, _ = self.run_cli('from-xliff', xliff_dir, back_dir,
+                                   {'side': 'target'})
+        self.assertEqual(files, 2)
+        with io.open(os.path.join(back_dir, 'app', 'messages.json'),
+                     encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {"hello": "Hello <b>World</b>",
+                                            "bye": u"Até já"})
+        with io.open(os.path.join(back_dir, 'labels.properties'),
+                     encoding='utf-8') as f:
+            self.assertEqual(f.read(), u'save=Save\ncancel=Cancel\n')
+
+    def test_main(self):
+        xliff_dir = os.path.join(self.root, 'xliff')
+        self.assertEqual(cli.main(['--workers', '1', 'to-xliff', self.strings,
+                                   xliff_dir]), 0)
+        self.assertTrue(os.path.exists(
+            os.path.join(xliff_dir, 'app', 'messages.json.xlf')))
+
+    def test_malformed_file_is_reported(self):
+        bad = os.path.join(self.strings, 'bad.json')
+        with io.open(bad, 'w', encoding='utf-8') as f:
+            f.write(u'{"broken": ')
+        xliff_dir = os.path.join(self.root, 'xliff')
+        out, err = StringIO(), StringIO()
+        files, _, _, failures = cli.run(
+            'to-xliff', self.strings, xliff_dir, {}, workers=2, out=out,
+            err=err)
+
+        self.assertEqual(files, 2)
+        self.assertEqual([source for source, _ in failures], [bad])
+        self.assertIn(bad, err.getvalue())
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertEqual(sorted(os.listdir(xliff_dir)),
+                         ['app', 'labels.properties.xlf'])
+        self.assertEqual(cli.main(['--workers', '1', 'to-xliff', self.strings,
+                                   xliff_dir]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from unbabel.api import Translation
+from unbabel.compression import RequestCompressor
+from unbabel.fakeserver import FakeUnbabelServer
+from unbabel.loadtest import run_load
+from unbabel.retry import RetryPolicy
+
+
+class TestFakeServer(unittest.TestCase):
+
+    def test_endpoints_over_http(self):
+        with FakeUnbabelServer(complete_after=None) as server:
+            api = server.client(compressor=RequestCompressor(threshold=0))
+            posted = [api.post_translations(u'Olá %s' % i, 'en',
+                                            source_language='pt')
+                      for i in range(5)]
+            self.assertEqual([t.status for t in posted], ['new'] * 5)
+            self.assertEqual(posted[0].price, 2)
+
+            listed = list(api.iter_translations(page_size=2))
+            self.assertEqual([t.uid for t in listed],
+                             [t.uid for t in posted])
+            self.assertEqual(server.requests[('GET', 'translation')], 3)
+            self.assertEqual(
+                [t.uid for t in api.iter_translations(uids=[posted[3].uid])],
+                [posted[3].uid])
+
+            self.assertEqual([t.uid for t in api.get_translations()],
+                             [t.uid for t in posted])
+            self.assertEqual(api.get_translations(as_batch=True).uids,
+                             [t.uid for t in posted])
+
+            fetched = api.get_translation(posted[0].uid)
+            self.assertIsInstance(fetched, Translation)
+            self.assertEqual(fetched.text, u'Olá 0')
+            self.assertEqual(api.get_word_count('one two three'), 3)
+            self.assertEqual(len(api.get_tones()), 4)
+            self.assertTrue(api.is_supported_pair('pt', 'en'))
+            self.assertEqual(api.get_account().username, 'fake')
+            api.close()
+
+    def test_jobs_complete_with_translation(self):
+        with FakeUnbabelServer(
+                translate=lambda text, target: text.upper()) as server:
+            api = server.client()
+            uid = api.post_mt_translations('hello', 'pt').uid
+            self.assertEqual(api.get_mt_translation(uid).translation,
+                             'HELLO')
+            self.assertEqual(
+                [t.translation for t in api.get_mt_translations()],
+                ['HELLO'])
+            self.assertEqual(len(api.get_mt_translations(as_batch=True)), 1)
+            api.close()
+
+    def test_throttled_requests_are_retried(self):
+        with FakeUnbabelServer(throttle_rate=0.5, retry_after=0,
+                               seed=1) as server:
+            api = server.client(retry_policy=RetryPolicy(max_attempts=20))
+            for i in range(5):
+                api.post_translations('text %s' % i, 'pt')
+            self.assertEqual(server.statuses[201], 5)
+            self.assertTrue(server.statuses[429] > 0)
+            self.assertEqual(len(list(api.iter_translations())), 5)
+            api.close()
+
+    def test_run_load(self):
+        with FakeUnbabelServer(error_rate=0.2, seed=3) as server:
+            api = server.client()
+            report = run_load(api, 'get_word_count', rps=100, duration=0.3,
+                              workers=4)
+            api.close()
+        self.assertEqual(report.requests, 30)
+        self.assertEqual(report.errors['Exception'],
+                         30 - len(report.latencies))
+        self.assertTrue(report.errors)
+        self.assertTrue(report.percentile(0.5) <= report.percentile(0.99))
+        self.assertTrue(report.throughput > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
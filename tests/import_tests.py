@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for slow CI machines, far below the cost of importing
+# requests and configuring logging.
+IMPORT_BUDGET_SECONDS = 0.05
+
+SCRIPT = """
+import logging, sys, time
+start = time.perf_counter()
+import unbabel
+elapsed = time.perf_counter() - start
+loaded = sorted(m for m in ('requests', 'six', 'unbabel.api',
+                            'unbabel.xliff_converter') if m in sys.modules)
+print(elapsed)
+print(','.join(loaded))
+print(len(logging.getLogger().handlers))
+unbabel.api.UnbabelApi
+print('requests' in sys.modules)
+"""
+
+
+class TestPackageImport(unittest.TestCase):
+
+    def test_import_is_lazy_and_side_effect_free(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT], cwd=ROOT).decode('utf-8')
+        elapsed, loaded, handlers, requests_loaded = output.split('\n')[:4]
+        self.assertLess(float(elapsed), IMPORT_BUDGET_SECONDS)
+        self.assertEqual(loaded, '')
+        self.assertEqual(handlers, '0')
+        self.assertEqual(requests_loaded, 'True')
+
+
+if __name__ == "__main__":
+    unittest.main()
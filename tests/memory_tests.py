@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import requests_mock
+
+from unbabel.api import UnbabelApi
+from unbabel.memory import TranslationMemory
+
+
+class TestTranslationMemory(unittest.TestCase):
+
+    @requests_mock.Mocker()
+    def test_completed_translations_are_not_resubmitted(self, m):
+        memory = TranslationMemory()
+        api = UnbabelApi('user', 'key', translation_memory=memory)
+        m.post('/tapi/v2/translation/', status_code=201, json={
+            "uid": "u1", "text": "Hello  world", "status": "new",
+            "source_language": "en", "target_language": "pt"})
+        m.get('/tapi/v2/translation/u1/', json={
+            "uid": "u1", "text": "Hello  world", "status": "completed",
+            "translatedText": u"Olá mundo",
+            "source_language": "en", "target_language": "pt"})
+
+        first = api.post_translations(text="Hello  world",
+                                      target_language="pt",
+                                      source_language="en")
+        self.assertEqual(first.status, 'new')
+        api.get_translation('u1')
+
+        again = api.post_translations(text=" Hello world ",
+                                      target_language="pt",
+                                      source_language="en")
+        self.assertEqual(again.translation, u"Olá mundo")
+        self.assertEqual(m.call_count, 2)
+
+        api.post_translations(text="Hello world", target_language="fr",
+                              source_language="en")
+        self.assertEqual(m.call_count, 3)
+        stats = memory.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertEqual(stats['entries'], 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        ticks = iter(range(100))
+        memory = TranslationMemory(max_entries=2, clock=lambda: next(ticks))
+        keys = [memory.make_key('translation', text, 'pt')
+                for text in ('a', 'b', 'c')]
+        memory.store(keys[0], {"uid": "1", "text": "a"})
+        memory.store(keys[1], {"uid": "2", "text": "b"})
+        memory.lookup(keys[0])
+        memory.store(keys[2], {"uid": "3", "text": "c"})
+
+        self.assertIsNotNone(memory.lookup(keys[0]))
+        self.assertIsNone(memory.lookup(keys[1]))
+        self.assertEqual(memory.stats()['entries'], 2)
+
+    @requests_mock.Mocker()
+    def test_pending_submissions_are_cleared(self, m):
+        memory = TranslationMemory()
+        api = UnbabelApi('user', 'key', translation_memory=memory)
+        for uid, text in (('u1', 'one'), ('u2', 'two')):
+            m.post('/tapi/v2/translation/', status_code=201, json={
+                "uid": uid, "text": text, "status": "new"})
+            api.post_translations(text=text, target_language="pt")
+        self.assertEqual(memory.stats()['pending'], 2)
+
+        m.get('/tapi/v2/translation/', json={"objects": [
+            {"uid": "u1", "text": "one", "status": "completed",
+             "translatedText": "um"},
+            {"uid": "u2", "text": "two", "status": "failed"}]})
+        api.get_translations()
+        stats = memory.stats()
+        self.assertEqual((stats['entries'], stats['pending']), (1, 0))
+
+    def test_pending_submissions_count_towards_the_bound(self):
+        ticks = iter(range(100))
+        memory = TranslationMemory(max_entries=2, clock=lambda: next(ticks))
+        memory.remember('k1', {"uid": "1", "status": "new"})
+        memory.store('k2', {"uid": "2", "status": "completed"})
+        memory.remember('k3', {"uid": "3", "status": "new"})
+        stats = memory.stats()
+        self.assertEqual((stats['entries'], stats['pending']), (1, 1))
+        self.assertIsNotNone(memory.lookup('k2'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+import requests_mock
+
+from unbabel.api import MTTranslation, Translation, UnbabelApi
+from unbabel.fakeserver import API_PREFIX, FakeUnbabelServer
+from unbabel.mirror import TranslationMirror, parse_timestamp
+
+ORDER = '&order_by=modified&order_by=uid'
+
+
+def translation(uid, status, modified, target_language='pt'):
+    return {"uid": uid, "text": "foo", "status": status,
+            "source_language": "en", "target_language": target_language,
+            "modified": modified}
+
+
+class TestTranslationMirror(unittest.TestCase):
+
+    @requests_mock.Mocker()
+    def test_incremental_sync(self, m):
+        m.get('/tapi/v2/translation/?limit=100' + ORDER, complete_qs=True,
+              json={"meta": {"next": None}, "objects": [
+                  translation('a', 'new', '2026-01-01T10:00:00'),
+                  translation('b', 'completed', '2026-01-01T11:00:00', 'fr'),
+              ]})
+        m.get('/tapi/v2/mt_translation/?limit=100' + ORDER,
+              complete_qs=True,
+              json={"meta": {"next": None}, "objects": [
+                  translation('m', 'completed', '2026-01-01T09:00:00')]})
+        m.get('/tapi/v2/translation/?limit=100'
+              '&modified__gte=2026-01-01T11:00:00' + ORDER, complete_qs=True,
+              json={"meta": {"next": None}, "objects": [
+                  translation('a', 'completed', '2026-01-02T10:00:00'),
+                  translation('b', 'completed', '2026-01-01T11:00:00', 'fr'),
+              ]})
+        m.get('/tapi/v2/mt_translation/?limit=100'
+              '&modified__gte=2026-01-01T09:00:00' + ORDER,
+              complete_qs=True,
+              json={"meta": {"next": None}, "objects": []})
+
+        mirror = TranslationMirror(UnbabelApi('user', 'key'))
+        self.assertEqual(mirror.sync(), 3)
+        self.assertEqual(mirror.count(status='new'), 1)
+        self.assertIsInstance(mirror.get('m', kind='mt_translation'),
+                              MTTranslation)
+
+        self.assertEqual(mirror.sync(), 2)
+        self.assertEqual(mirror.cursor(), '2026-01-02T10:00:00')
+        completed = mirror.by_status('completed')
+        self.assertEqual([t.uid for t in completed], ['a', 'b'])
+        self.assertIsInstance(completed[0], Translation)
+        self.assertEqual([t.uid for t in mirror.by_language_pair('en', 'fr')],
+                         ['b'])
+
+    @requests_mock.Mocker()
+    def test_sync_pages_from_last_modified(self, m):
+        m.get('/tapi/v2/translation/?limit=2' + ORDER, complete_qs=True,
+              json={"meta": {"next": "/tapi/v2/translation/?offset=2"},
+                    "objects": [
+                        translation('a', 'new', '2026-01-01T09:00:00Z'),
+                        translation('b', 'new', '2026-01-01T12:00:00+02:00'),
+                    ]})
+        # Where an offset would have been, the next page starts from the
+        # last modified value, skipping the one object already read there.
+        m.get('/tapi/v2/translation/?limit=2'
+              '&modified__gte=2026-01-01T12%3A00%3A00%2B02%3A00&offset=1' +
+              ORDER, complete_qs=True,
+              json={"meta": {"next": None}, "objects": [
+                  translation('c', 'new', '2026-01-01T10:30:00.5Z')]})
+
+        mirror = TranslationMirror(UnbabelApi('user', 'key'))
+        self.assertEqual(mirror.sync(kinds=['translation'], page_size=2), 3)
+        self.assertEqual(mirror.cursor(), '2026-01-01T10:30:00.5Z')
+
+    def test_sync_over_fake_server(self):
+        with FakeUnbabelServer(complete_after=None) as server:
+            api = server.client()
+            uids = [api.post_translations(u'Text %s' % i, 'pt').uid
+                    for i in range(3)]
+            # Modifying the first job moves it after the others.
+            server.handle('PATCH', '{}translation/{}/'.format(
+                API_PREFIX, uids[0]), {'Authorization': 'ApiKey fake:fake'},
+                json.dumps({'status': 'canceled'}).encode('utf-8'))
+
+            mirror = TranslationMirror(api)
+            self.assertEqual(mirror.sync(kinds=['translation'],
+                                         page_size=1), 3)
+            self.assertEqual(mirror.count(), 3)
+            self.assertEqual(mirror.count(status='canceled'), 1)
+            api.close()
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp('2026-01-01T12:00:00+02:00'),
+                         parse_timestamp('2026-01-01T10:00:00Z'))
+        self.assertEqual(parse_timestamp('2026-01-01T10:00:00.25'),
+                         parse_timestamp('2026-01-01 10:00:00.250000+0000'))
+        self.assertRaises(ValueError, parse_timestamp, 'yesterday')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import requests_mock
+
+from unbabel.api import UnbabelApi
+from unbabel.retry import (RetryPolicy, TokenBucket, get_rate_limiter,
+                           parse_retry_after, set_rate_limit)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRetry(unittest.TestCase):
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.backoff(a) for a in range(1, 5)],
+                         [1, 2, 4, 5])
+        self.assertEqual(policy.backoff(1, retry_after=3), 3)
+        self.assertEqual(parse_retry_after('7'), 7)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_token_bucket_limits_rate(self):
+        clock = Clock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock,
+                             sleep=clock.sleep)
+        for _ in range(6):
+            bucket.acquire()
+        self.assertAlmostEqual(clock.now, 2.0)
+
+        bucket.pause(10)
+        bucket.acquire()
+        self.assertGreaterEqual(clock.now, 12.0)
+
+    def test_shared_rate_limiter(self):
+        limiter = set_rate_limit(5)
+        try:
+            self.assertIs(get_rate_limiter(), limiter)
+        finally:
+            set_rate_limit(None)
+        self.assertIsNone(get_rate_limiter())
+
+    @requests_mock.Mocker()
+    def test_api_retries_with_stable_uid(self, m):
+        delays = []
+        m.post('/tapi/v2/translation/', [
+            {'status_code': 503, 'json': {}},
+            {'status_code': 429, 'json': {}, 'headers': {'Retry-After': '2'}},
+            {'status_code': 201, 'json': {"uid": "abc", "text": "Hello"}},
+        ])
+        api = UnbabelApi('user', 'key', retry_policy=RetryPolicy(
+            sleep=delays.append, jitter=False))
+
+        translation = api.post_translations(text="Hello",
+                                            target_language="pt")
+        self.assertEqual(translation.uid, 'abc')
+        self.assertEqual(delays, [0.5, 2])
+        uids = set(r.json()['uid'] for r in m.request_history)
+        self.assertEqual(len(uids), 1)
+
+    @requests_mock.Mocker()
+    def test_api_gives_up_after_max_attempts(self, m):
+        m.get('/tapi/v2/translation/x/', status_code=503)
+        api = UnbabelApi('user', 'key', retry_policy=RetryPolicy(
+            max_attempts=2, sleep=lambda s: None))
+
+        self.assertRaises(ValueError, api.get_translation, 'x')
+        self.assertEqual(m.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
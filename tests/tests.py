@@ -5,14 +5,27 @@ Created on Jan 3, 2014
 @author: joaograca
 '''
 
+import json
 import os
+import threading
+import time
 import unittest
+import zlib
 
 import six
+import requests
 import requests_mock
 
 from unbabel.api import (UnbabelApi, LangPair, Tone, Topic,
-                         Translation, Account, BadRequestException)
+                         Translation, MTTranslation, Translator, Account,
+                         BadRequestException,
+                         BulkTranslationException,
+                         DocumentTranslationException, TranslationBatch,
+                         TranslationTimeoutException)
+from unbabel.bulk import BulkSubmitter, build_body
+from unbabel.codec import JsonCodec, get_default_codec
+from unbabel.compression import RequestCompressor
+from unbabel.metrics import MetricsCollector
 
 
 class TestUnbabelAPI(unittest.TestCase):
@@ -160,6 +173,32 @@ class TestUnbabelAPI(unittest.TestCase):
         self.assertEqual(translation.price, trans.price, 'price not equal')
         self.assertEqual(translation.text, trans.text, 'text not equal')
 
+    @requests_mock.Mocker()
+    def test_single_and_listed_translations_match(self, m):
+        translation = {
+            "uid": "t1", "text": "Hello", "status": "completed",
+            "modified": "2026-01-01T10:00:00",
+            "translators": [{"first_name": "A", "last_name": "B",
+                             "picture_url": "", "profile_url": ""}]}
+        mt_translation = {"uid": "m1", "text": "Hello",
+                          "translatedText": u"Olá",
+                          "modified": "2026-01-01T10:00:00"}
+        m.get('/tapi/v2/translation/t1/', json=translation)
+        m.get('/tapi/v2/translation/', json={"objects": [translation]})
+        m.get('/tapi/v2/mt_translation/m1/', json=mt_translation)
+        m.get('/tapi/v2/mt_translation/', json={"objects": [mt_translation]})
+
+        single = self.api.get_translation('t1')
+        listed = self.api.get_translations()[0]
+        for t in (single, listed):
+            self.assertIsInstance(t, Translation)
+            self.assertIsInstance(t.translators[0], Translator)
+        mt_single = self.api.get_mt_translation('m1')
+        mt_listed = self.api.get_mt_translations()[0]
+        for t in (mt_single, mt_listed):
+            self.assertIsInstance(t, MTTranslation)
+            self.assertEqual(t.translation, u'Olá')
+
     @requests_mock.Mocker()
     def test_api_get_account(self, m):
         m.get('/tapi/v2/account/', json={
@@ -267,6 +306,407 @@ class TestUnbabelAPI(unittest.TestCase):
         self.UNBABEL_TEST_API_KEY = os.environ.get('UNBABEL_TEST_API_KEY')
         if hasattr(self, '_api'): delattr(self, '_api')
 
+    @requests_mock.Mocker()
+    def test_api_reuses_pooled_session(self, m):
+        m.get('/tapi/v2/topic/', json={"objects": []})
+        m.post('/tapi/v2/wordcount/', json={"word_count": 2},
+               status_code=201)
+        with UnbabelApi(self.user, self.key, pool_maxsize=4) as api:
+            adapter = api.session.get_adapter('https://unbabel.com/')
+            self.assertEqual(adapter._pool_maxsize, 4)
+            api.get_topics()
+            api.get_word_count("two words")
+        self.assertEqual(m.call_count, 2)
+
+    def test_api_close_only_owned_session(self):
+        closed = []
+
+        class Session(requests.Session):
+            def close(self):
+                closed.append(self)
+
+        shared = Session()
+        UnbabelApi(self.user, self.key, session=shared).close()
+        self.assertEqual(closed, [])
+
+    @requests_mock.Mocker()
+    def test_post_bulk_translations_in_batches(self, m):
+        def respond(request, context):
+            context.status_code = 202
+            objects = request.json()['objects']
+            if any(o['text'] == 'bad' for o in objects):
+                context.status_code = 400
+                return {"error": "bad request"}
+            return {"objects": [dict(o, uid=o['text']) for o in objects]}
+
+        m.patch('/tapi/v2/translation/', json=respond)
+        items = [{'text': str(i), 'target_language': 'pt'} for i in range(7)]
+
+        translations = self.api.post_bulk_translations(
+            items, batch_size=3, workers=2)
+        self.assertEqual([t.uid for t in translations],
+                         [str(i) for i in range(7)])
+        self.assertEqual(m.call_count, 3)
+        self.assertFalse(self.api.is_bulk)
+
+        items[4]['text'] = 'bad'
+        report = self.api.post_bulk_translations(
+            items, batch_size=3, workers=2, report=True)
+        self.assertFalse(report.ok)
+        self.assertEqual([b.start for b in report.failed], [3])
+        self.assertIsInstance(report.failed[0].error, BadRequestException)
+        self.assertEqual([t and t.uid for t in report.translations],
+                         ['0', '1', '2', None, None, None, '6'])
+        self.assertRaises(BulkTranslationException,
+                          self.api.post_bulk_translations, items,
+                          batch_size=3)
+
+    @requests_mock.Mocker()
+    def test_bulk_response_count_mismatch_fails_the_batch(self, m):
+        def respond(request, context):
+            context.status_code = 202
+            objects = request.json()['objects']
+            if objects[0]['text'] == '3':
+                objects = objects[1:]
+            return {"objects": [dict(o, uid=o['text']) for o in objects]}
+
+        m.patch('/tapi/v2/translation/', json=respond)
+        items = [{'text': str(i), 'target_language': 'pt'} for i in range(7)]
+
+        report = self.api.post_bulk_translations(
+            items, batch_size=3, report=True)
+        self.assertEqual([b.start for b in report.failed], [3])
+        self.assertIsInstance(report.failed[0].error, ValueError)
+        self.assertEqual([t and t.uid for t in report.translations],
+                         ['0', '1', '2', None, None, None, '6'])
+
+    @requests_mock.Mocker()
+    def test_post_document_in_chunks(self, m):
+        posted = {}
+
+        def respond(request, context):
+            context.status_code = 201
+            data = request.json()
+            posted[data['uid']] = data['text']
+            return dict(data, status="new", price=2)
+
+        def fetch(request, context):
+            uid = request.path.rstrip('/').split('/')[-1]
+            return {"uid": uid, "text": posted[uid], "status": "completed",
+                    "translatedText": posted[uid].upper()}
+
+        m.post('/tapi/v2/translation/', json=respond)
+        m.get(requests_mock.ANY, json=fetch)
+        text = "First sentence. Second one!\n\nA new paragraph here.\n"
+
+        job = self.api.post_document(text, "pt", max_chars=25, uid="doc")
+        self.assertEqual(job.uids, ["doc-0", "doc-1", "doc-2"])
+        self.assertEqual([posted[uid] for uid in job.uids],
+                         ["First sentence.", "Second one!",
+                          "A new paragraph here."])
+        self.assertEqual(job.text, text)
+        self.assertEqual(job.status, "new")
+        self.assertEqual(job.price, 6)
+        self.assertIsNone(job.translation)
+
+        self.api.get_document(job)
+        self.assertTrue(job.done)
+        self.assertEqual(job.translation,
+                         "FIRST SENTENCE. SECOND ONE!\n\nA NEW PARAGRAPH "
+                         "HERE.\n")
+
+    @requests_mock.Mocker()
+    def test_post_bulk_translations_checks_items_first(self, m):
+        m.patch('/tapi/v2/translation/', status_code=202, json=lambda r, c: {
+            "objects": [dict(o, uid=o['text']) for o in r.json()['objects']]})
+        items = [{'text': str(i), 'target_language': 'pt'} for i in range(10)]
+        items[7]['colour'] = 'red'
+
+        self.assertRaises(TypeError, self.api.post_bulk_translations, items,
+                          batch_size=3)
+        self.assertEqual(m.call_count, 0)
+
+        with self.assertRaises(TypeError) as raised:
+            self.api.post_bulk_translations(iter(items), batch_size=3)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual([t.uid for t in raised.exception.report.translations],
+                         [str(i) for i in range(6)])
+
+    @requests_mock.Mocker()
+    def test_post_document_keeps_posted_chunks_on_error(self, m):
+        def respond(request, context):
+            data = request.json()
+            if data['text'] == 'Bad one.':
+                context.status_code = 400
+                return {"error": "bad request"}
+            context.status_code = 201
+            return dict(data, status="new")
+
+        m.post('/tapi/v2/translation/', json=respond)
+        with self.assertRaises(DocumentTranslationException) as raised:
+            self.api.post_document("Good one. Bad one. Fine one.", "pt",
+                                   max_chars=10, uid="doc")
+        job = raised.exception.value
+        self.assertEqual(job.uids, ["doc-0", "doc-2"])
+        self.assertEqual(job.failed, [1])
+        self.assertIsInstance(job.errors[1], BadRequestException)
+        self.assertEqual(job.sources[1], "Bad one.")
+        self.assertEqual(job.text, "Good one. Bad one. Fine one.")
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(job.translation)
+
+    @requests_mock.Mocker()
+    def test_bulk_submitter_splits_batches_by_bytes(self, m):
+        m.patch('/tapi/v2/translation/', status_code=202, json=lambda r, c: {
+            "objects": [dict(o, uid=o['text']) for o in r.json()['objects']]})
+        submitter = BulkSubmitter(self.api, batch_size=100, workers=1)
+        item = {'text': 'x' * 10, 'target_language': 'pt', 'uid': 'u'}
+        # Room for two items per request, not three.
+        submitter.batch_bytes = len(build_body([submitter.encode(item)] * 2))
+
+        report = submitter.submit_all([dict(item) for _ in range(5)])
+        self.assertEqual([batch.start for batch in report.batches], [0, 2, 4])
+        self.assertTrue(all(len(request.body) <= submitter.batch_bytes
+                            for request in m.request_history))
+
+    @requests_mock.Mocker()
+    def test_api_iter_translations_follows_pages(self, m):
+        def page(uids, next_url):
+            return {"meta": {"next": next_url},
+                    "objects": [{"uid": uid, "text": "foo",
+                                 "status": "completed"} for uid in uids]}
+
+        m.get('/tapi/v2/translation/?limit=2&status=completed',
+              complete_qs=True,
+              json=page(['a', 'b'], '/tapi/v2/translation/?limit=2&offset=2'))
+        m.get('/tapi/v2/translation/?limit=2&offset=2', complete_qs=True,
+              json=page(['c'], None))
+
+        translations = self.api.iter_translations(status='completed',
+                                                  page_size=2)
+        self.assertNotIsInstance(translations, list)
+        self.assertEqual([t.uid for t in translations], ['a', 'b', 'c'])
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_api_get_translations_as_batch(self, m):
+        m.get("/tapi/v2/translation/", json={"objects": [
+            {"uid": "a", "text": "foo", "status": "completed", "price": 4,
+             "source_language": "en", "target_language": "pt"},
+            {"uid": "b", "text": "bar", "status": "new", "price": 6,
+             "source_language": "en", "target_language": "fr"},
+            {"uid": "c", "text": "baz", "status": "completed", "price": 2,
+             "source_language": "en", "target_language": "pt"},
+        ]})
+        batch = self.api.get_translations(as_batch=True)
+        self.assertIsInstance(batch, TranslationBatch)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.uids, ['a', 'b', 'c'])
+        self.assertEqual(sum(batch.prices), 12)
+        self.assertTrue(all(isinstance(t, Translation) for t in batch))
+        self.assertEqual(batch[1].text, 'bar')
+
+        completed = batch.filter(status='completed', target_language='pt')
+        self.assertEqual(completed.uids, ['a', 'c'])
+        groups = batch.group_by_language_pair()
+        self.assertEqual(sorted(groups), [('en', 'fr'), ('en', 'pt')])
+        self.assertEqual(groups[('en', 'fr')].uids, ['b'])
+        self.assertEqual(len(batch.group_by_status()['completed']), 2)
+        self.assertFalse(hasattr(batch[0], '__dict__'))
+
+    @requests_mock.Mocker()
+    def test_api_uses_codec_for_bodies(self, m):
+        calls = []
+
+        class Codec(JsonCodec):
+            def dumps(self, obj):
+                calls.append('dumps')
+                return super(Codec, self).dumps(obj)
+
+            def loads(self, data):
+                calls.append('loads')
+                return super(Codec, self).loads(data)
+
+        m.post('/tapi/v2/wordcount/', json={"word_count": 2},
+               status_code=201)
+        api = UnbabelApi(self.user, self.key, codec=Codec())
+        self.assertEqual(api.get_word_count(u"olá mundo"), 2)
+        self.assertEqual(calls, ['dumps', 'loads'])
+        self.assertIsInstance(m.last_request.body, bytes)
+        self.assertIsInstance(get_default_codec(), JsonCodec)
+
+    @requests_mock.Mocker()
+    def test_api_as_completed_polls_listings(self, m):
+        rounds = {'completed': [[], ['b'], ['a', 'b']]}
+
+        def listing(request, context):
+            uids = request.qs['uid__in'][0].split(',')
+            status = request.qs['status'][0]
+            done = rounds.get(status, [[]])
+            finished = done.pop(0) if len(done) > 1 else done[0]
+            return {"meta": {"next": None}, "objects": [
+                {"uid": uid, "text": "foo", "status": status}
+                for uid in uids if uid in finished]}
+
+        m.get('/tapi/v2/translation/', json=listing)
+        completed = self.api.as_completed(['a', 'b'], min_interval=0,
+                                          max_interval=0)
+        self.assertEqual([t.uid for t in completed], ['b', 'a'])
+        # 3 rounds of one listing per final status for the single batch
+        self.assertEqual(m.call_count, 9)
+
+        rounds['completed'] = [[]]
+        self.assertRaises(TranslationTimeoutException,
+                          self.api.wait_for_translations, ['a'],
+                          timeout=0, min_interval=0)
+
+    @requests_mock.Mocker()
+    def test_api_get_word_counts(self, m):
+        def count(request, context):
+            context.status_code = 201
+            return {"word_count": 2 * len(request.json()['text'].split())}
+
+        m.post('/tapi/v2/wordcount/', json=count)
+        texts = ["one two", "three", "one two", "four five six"]
+
+        self.assertEqual(self.api.get_word_counts(texts), [4, 2, 4, 6])
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(self.api.get_word_counts(texts[:2]), [4, 2])
+        self.assertEqual(m.call_count, 3)
+
+        self.assertEqual(
+            self.api.get_word_counts(["seven eight nine ten"], estimate=True),
+            [8])
+        self.assertEqual(m.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_api_hooks_and_metrics(self, m):
+        m.get('/tapi/v2/translation/abc/', json={"uid": "abc", "text": "x"})
+        m.get('/tapi/v2/translation/missing/', status_code=404)
+        api = UnbabelApi(self.user, self.key)
+        events = []
+        api.add_hook('before_request', events.append)
+        collector = MetricsCollector().install(api)
+
+        api.get_translation('abc')
+        self.assertRaises(ValueError, api.get_translation, 'missing')
+
+        self.assertEqual([e.endpoint for e in events],
+                         ['translation/{uid}/'] * 2)
+        self.assertEqual(events[0].status, 200)
+        self.assertGreater(events[0].response_bytes, 0)
+        self.assertEqual(collector.request_count('translation/{uid}/'), 2)
+        exported = collector.to_prometheus()
+        self.assertIn('unbabel_requests_total{endpoint="translation/{uid}/",'
+                      'method="GET",status="404"} 1', exported)
+        self.assertIn('unbabel_request_errors_total{endpoint='
+                      '"translation/{uid}/",method="GET"} 1', exported)
+        self.assertIn('unbabel_request_duration_seconds_count{endpoint='
+                      '"translation/{uid}/",method="GET"} 2', exported)
+
+    def test_single_flight_coalesces_concurrent_reads(self):
+        api = UnbabelApi(self.user, self.key, single_flight=True)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch(uid):
+            calls.append(uid)
+            started.set()
+            release.wait(1)
+            return Translation(uid=uid)
+
+        api._get_translation = fetch
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(api.get_translation('a')))
+            for _ in range(4)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        while api.single_flight.calls < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertEqual(api.single_flight.stats(),
+                         {'calls': 4, 'coalesced': 3})
+
+    @requests_mock.Mocker()
+    def test_bulk_submitter_streams_from_threads(self, m):
+        m.patch('/tapi/v2/translation/', status_code=202,
+                json=lambda request, context: {"objects": [
+                    dict(o, uid=o['text'])
+                    for o in request.json()['objects']]})
+
+        def items(offset):
+            for i in range(10):
+                yield {'text': str(offset + i), 'target_language': 'pt',
+                       'tone': None}
+
+        submitter = BulkSubmitter(self.api, batch_size=4, workers=2,
+                                  max_pending=1)
+        threads = [threading.Thread(
+            target=lambda o=o: [submitter.add(i) for i in items(o)])
+            for o in (0, 100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report = submitter.close()
+
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(t.uid for t in report.translations),
+                         sorted(str(i) for i in
+                                list(range(10)) + list(range(100, 110))))
+        self.assertTrue(all(len(r.json()['objects']) <= 4
+                            for r in m.request_history))
+        self.assertNotIn('tone', m.request_history[0].json()['objects'][0])
+        self.assertRaises(TypeError, self.api.post_bulk_translations,
+                          [{'text': 'a', 'target_language': 'pt', 'x': 1}])
+
+    @requests_mock.Mocker()
+    def test_bulk_submitter_can_keep_only_uids(self, m):
+        m.patch('/tapi/v2/translation/', status_code=202, json=lambda r, c: {
+            "objects": [dict(o, uid=o['text']) for o in r.json()['objects']]})
+        answered = []
+        submitter = BulkSubmitter(self.api, batch_size=3, workers=2,
+                                  on_batch=answered.append,
+                                  keep_translations=False)
+
+        report = submitter.submit_all(
+            {'text': str(i), 'target_language': 'pt'} for i in range(7))
+        self.assertEqual(sorted(b.start for b in answered), [0, 3, 6])
+        self.assertTrue(all(b.translations for b in answered))
+        self.assertEqual(report.uids, [str(i) for i in range(7)])
+        self.assertEqual(report.translations, [None] * 7)
+        self.assertTrue(all(b.translations is None for b in report.batches))
+
+    @requests_mock.Mocker()
+    def test_api_compresses_large_bodies(self, m):
+        m.patch('/tapi/v2/translation/', status_code=202,
+                json={"objects": [{"uid": str(i), "text": "same text"}
+                                  for i in range(5)]})
+        m.post('/tapi/v2/wordcount/', status_code=201,
+               json={"word_count": 1})
+        compressor = RequestCompressor(threshold=100)
+        api = UnbabelApi(self.user, self.key, compressor=compressor)
+
+        api.post_bulk_translations([{'text': 'same text ' * 20,
+                                     'target_language': 'pt'}] * 5)
+        request = m.last_request
+        self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(request.headers['Accept-Encoding'], 'gzip, deflate')
+        body = zlib.decompress(request.body, 16 + zlib.MAX_WBITS)
+        self.assertEqual(len(json.loads(body.decode('utf-8'))['objects']), 5)
+        self.assertGreater(compressor.stats()['request_bytes_saved'], 0)
+
+        api.get_word_count('word ' * 100)
+        self.assertNotIn('Content-Encoding', m.last_request.headers)
+
 
 if __name__ == "__main__":
     unittest.main()
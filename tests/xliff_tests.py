@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import unittest
+import xml.etree.ElementTree as ET
+
+import six
+
+from unbabel.xliff_converter import (generate_incremental_xliff,
+                                     generate_xliff, get_dictionary_from_xliff,
+                                     iter_xliff, iter_xliff_units,
+                                     merge_xliff_translations, write_xliff)
+
+TRANSLATED_XLIFF = u"""<?xml version="1.0" encoding="UTF-8"?>
+<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">
+<file original="" source-language="en" target-language="pt">
+<body>
+<trans-unit id="1"><source>Hello</source><target> Olá </target></trans-unit>
+<trans-unit id="2"><source>Bye <g id="b">now</g></source></trans-unit>
+</body>
+</file>
+</xliff>"""
+
+
+def parse_units(xliff):
+    root = ET.fromstring(xliff.encode('utf-8'))
+    return dict((unit.get('id'), unit.find('source').text.strip())
+                for unit in root.iter('trans-unit'))
+
+
+class TestXliffConverter(unittest.TestCase):
+
+    def test_generate_escapes_values(self):
+        entries = {"1": "Fish & <chips>", "2": u"Olá \"mundo\""}
+        xliff = generate_xliff(entries, source_language="en",
+                               target_language="pt")
+        self.assertIn('source-language = "en"', xliff)
+        self.assertIn("Fish &amp; &lt;chips&gt;", xliff)
+        self.assertEqual(parse_units(xliff), entries)
+
+    def test_write_from_iterable_of_pairs(self):
+        pairs = ((str(i), "text %s" % i) for i in range(3))
+        out = six.StringIO()
+        write_xliff(pairs, out)
+        self.assertEqual(parse_units(out.getvalue()),
+                         {"0": "text 0", "1": "text 1", "2": "text 2"})
+        self.assertEqual(len(list(iter_xliff([("a", "b")]))), 3)
+
+    def test_get_dictionary_round_trip(self):
+        entries = {"1": "Fish & <chips>", "2": u"Olá \"mundo\""}
+        self.assertEqual(get_dictionary_from_xliff(generate_xliff(entries)),
+                         entries)
+
+    def test_get_dictionary_sides(self):
+        self.assertEqual(get_dictionary_from_xliff(TRANSLATED_XLIFF),
+                         {"1": u"Olá", "2": "Bye now"})
+        self.assertEqual(
+            get_dictionary_from_xliff(TRANSLATED_XLIFF, side="source"),
+            {"1": "Hello", "2": "Bye now"})
+
+    def test_iter_units_from_file(self):
+        units = list(iter_xliff_units(
+            six.BytesIO(TRANSLATED_XLIFF.encode('utf-8'))))
+        self.assertEqual(units, [("1", "Hello", u"Olá"),
+                                 ("2", "Bye now", None)])
+
+    def test_incremental_xliff_only_holds_changes(self):
+        first = {"1": "Hello", "2": "Bye", "3": "Gone"}
+        xliff, manifest = generate_incremental_xliff(first)
+        self.assertEqual(sorted(parse_units(xliff)), ["1", "2", "3"])
+        previous = {"1": u"Olá", "2": "Adeus", "3": "Ido"}
+
+        second = {"1": "Hello", "2": "Bye bye", "4": "New"}
+        xliff, manifest = generate_incremental_xliff(second, manifest)
+        self.assertEqual(parse_units(xliff), {"2": "Bye bye", "4": "New"})
+
+        translated = xliff.replace(
+            "<source>", "<target>T</target><source>", 1)
+        merged = merge_xliff_translations(previous, translated, manifest)
+        self.assertEqual(merged, {"1": u"Olá", "2": "T"})
+        self.assertEqual(sorted(manifest), ["1", "2"])
+
+    def test_untranslated_units_are_sent_again(self):
+        entries = {"1": "Hello", "2": "New"}
+        xliff, manifest = generate_incremental_xliff(entries)
+        translated = xliff.replace(
+            "</source>", u"</source><target>Olá</target>", 1)
+        merged = merge_xliff_translations({}, translated, manifest)
+        self.assertEqual(merged, {"1": u"Olá"})
+
+        xliff, manifest = generate_incremental_xliff(entries, manifest)
+        self.assertEqual(parse_units(xliff), {"2": "New"})
+
+
+if __name__ == "__main__":
+    unittest.main()
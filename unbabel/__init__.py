@@ -1,4 +1,5 @@
-import unbabel.api
+import importlib
+import logging
 
 LOG_CONFIG = {
     'version': 1,
@@ -27,7 +28,32 @@ LOG_CONFIG = {
     },
 }
 
-import logging
-from logging.config import dictConfig
-dictConfig(LOG_CONFIG)
 logger = logging.getLogger()
+
+# Submodules are only imported, along with their dependencies, the first time
+# they are accessed as attributes of the package.
+_SUBMODULES = frozenset((
+    'api', 'async_api', 'bulk', 'cache', 'callbacks', 'chunking', 'cli',
+    'codec', 'compression', 'fakeserver', 'loadtest', 'memory', 'metrics',
+    'mirror', 'retry', 'singleflight', 'wordcount', 'xliff_converter',
+))
+
+
+def configure_logging(config=None):
+    '''
+        Applies LOG_CONFIG (or ``config``), which importing the package no
+        longer does
+    '''
+    from logging.config import dictConfig
+    dictConfig(config or LOG_CONFIG)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -1,10 +1,28 @@
-import json
 import logging
 import os
-import copy
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
 
 import requests
+from requests.adapters import HTTPAdapter
 import six
+from six.moves.urllib.parse import urlencode, urljoin
+
+from unbabel.codec import get_default_codec
+from unbabel.compression import ACCEPT_ENCODING
+from unbabel.wordcount import (WordCountCache, WordCountEstimator,
+                               text_key)
+from unbabel.metrics import RequestEvent, endpoint_name
+from unbabel.singleflight import SingleFlight
+from unbabel.cache import DEFAULT_TTL
+from unbabel.retry import get_rate_limiter, parse_retry_after
+from unbabel.bulk import (DEFAULT_BATCH_SIZE, DEFAULT_BATCH_BYTES,
+                          BatchResult, BulkSubmitter, build_body)
+from unbabel.chunking import (DEFAULT_MAX_CHUNK_CHARS, join_chunks,
+                              split_document)
 
 log = logging.getLogger()
 
@@ -13,6 +31,30 @@ UNBABEL_SANDBOX_API_URL = os.environ.get(
 UNBABEL_API_URL = os.environ.get(
     'UNBABEL_API_URL', 'https://unbabel.com/tapi/v2/')
 
+# Number of per-host pools kept by the session and the number of connections
+# kept alive within each one of them.
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+DEFAULT_PAGE_SIZE = 100
+
+DEFAULT_WORD_COUNT_WORKERS = 4
+
+# Arguments of post_translations accepted in bulk submissions.
+BULK_TRANSLATION_FIELDS = frozenset((
+    'text', 'target_language', 'source_language', 'type', 'tone',
+    'visibility', 'public_url', 'callback_url', 'topics', 'instructions',
+    'uid', 'text_format', 'target_text', 'origin', 'client_owner_email',
+    'context', 'brand'))
+
+# Statuses after which a translation no longer changes, and the polling
+# settings used while waiting for them.
+FINAL_STATUSES = ('completed', 'failed', 'canceled')
+DEFAULT_WATCH_BATCH_SIZE = 50
+DEFAULT_MIN_POLL_INTERVAL = 5.0
+DEFAULT_MAX_POLL_INTERVAL = 60.0
+DEFAULT_DOCUMENT_WORKERS = 4
+
 
 class UnauthorizedException(Exception):
     def __init__(self, value):
@@ -30,7 +72,46 @@ class BadRequestException(Exception):
         return repr(self.value)
 
 
+class BulkTranslationException(Exception):
+    '''
+        Raised when some batches of a bulk submission failed. ``value`` holds
+        the BulkReport with the translations of the successful batches.
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+class DocumentTranslationException(Exception):
+    '''
+        Raised when some chunks of a document could not be posted. ``value``
+        holds the DocumentJob, with the posted chunks and the errors of the
+        others by index.
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+class TranslationTimeoutException(Exception):
+    '''
+        Raised when translations are not done in time. ``value`` holds the
+        uids still pending.
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
 class Language(object):
+    __slots__ = ('shortname', 'name')
+
     def __init__(self, shortname, name):
         self.shortname = shortname
         self.name = name
@@ -43,6 +124,8 @@ class Language(object):
 
 
 class Tone(object):
+    __slots__ = ('description', 'name')
+
     def __init__(self, description, name):
         self.description = description
         self.name = name
@@ -55,6 +138,8 @@ class Tone(object):
 
 
 class Topic(object):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -66,6 +151,8 @@ class Topic(object):
 
 
 class LangPair(object):
+    __slots__ = ('source_language', 'target_language')
+
     def __init__(self, source_language, target_language):
         self.source_language = source_language
         self.target_language = target_language
@@ -80,6 +167,8 @@ class LangPair(object):
 
 
 class Translator(object):
+    __slots__ = ('first_name', 'last_name', 'picture_url', 'profile_url')
+
     def __init__(self, first_name="", last_name="", picture_url="",
                  profile_url=""):
         self.first_name = first_name
@@ -95,6 +184,11 @@ class Translator(object):
 
 
 class Translation(object):
+    __slots__ = ('uid', 'text', 'translation', 'source_language',
+                 'target_language', 'status', 'translators', 'topics',
+                 'price', 'text_format', 'origin', 'price_plan', 'client',
+                 'balance', 'order_number', 'brand')
+
     def __init__(
             self,
             uid=-1,
@@ -140,6 +234,10 @@ class Translation(object):
 
 
 class MTTranslation(object):
+    __slots__ = ('uid', 'text', 'translation', 'source_language',
+                 'target_language', 'status', 'topics', 'text_format',
+                 'origin', 'client', 'brand')
+
     def __init__(
             self,
             uid=-1,
@@ -175,6 +273,8 @@ class MTTranslation(object):
 
 
 class Account(object):
+    __slots__ = ('username', 'email', 'balance')
+
     def __init__(self, username, email, balance):
         self.username = username
         self.email = email
@@ -187,6 +287,9 @@ class Account(object):
 
 
 class Job(object):
+    __slots__ = ('id', 'uid', 'order_id', 'status', 'text', 'price',
+                 'source_language', 'target_language', 'tone', 'text_format')
+
     def __init__(self, id, uid, order_id, status, source_language,
                  target_language,
                  text, price, tone, text_format):
@@ -207,6 +310,8 @@ class Job(object):
 
 
 class Order(object):
+    __slots__ = ('id', 'status', 'price')
+
     def __init__(self, id, status, price):
         self.id = id
         self.status = status
@@ -220,12 +325,252 @@ class Order(object):
         )
 
 
+class TranslationBatch(object):
+    '''
+        Column-oriented collection of Translation (or MTTranslation) objects.
+
+        Every attribute is kept in its own list and repeated values such as
+        statuses and languages are stored once, which makes large result sets
+        much smaller than a list of objects. Iterating or indexing a batch
+        yields regular model objects.
+    '''
+    INTERNED_FIELDS = ('status', 'source_language', 'target_language',
+                       'text_format', 'origin', 'client', 'brand')
+
+    def __init__(self, model=Translation):
+        self.model = model
+        self.columns = dict((field, []) for field in model.__slots__)
+        self._values = {}
+
+    @classmethod
+    def from_objects(cls, translations, model=Translation):
+        batch = cls(model)
+        batch.extend(translations)
+        return batch
+
+    def append(self, translation):
+        for field, column in six.iteritems(self.columns):
+            value = getattr(translation, field)
+            if field in self.INTERNED_FIELDS:
+                try:
+                    value = self._values.setdefault(value, value)
+                except TypeError:
+                    pass
+            column.append(value)
+
+    def extend(self, translations):
+        for translation in translations:
+            self.append(translation)
+
+    def __len__(self):
+        return len(self.columns['uid'])
+
+    def __getitem__(self, index):
+        translation = self.model.__new__(self.model)
+        for field, column in six.iteritems(self.columns):
+            setattr(translation, field, column[index])
+        return translation
+
+    def __iter__(self):
+        for index in six.moves.range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        return "<TranslationBatch of %s>" % len(self)
+
+    @property
+    def uids(self):
+        return self.columns['uid']
+
+    @property
+    def statuses(self):
+        return self.columns['status']
+
+    @property
+    def prices(self):
+        return self.columns.get('price')
+
+    @property
+    def language_pairs(self):
+        return list(zip(self.columns['source_language'],
+                        self.columns['target_language']))
+
+    def _take(self, indexes):
+        batch = TranslationBatch(self.model)
+        for field, column in six.iteritems(self.columns):
+            batch.columns[field] = [column[index] for index in indexes]
+        batch._values = self._values
+        return batch
+
+    def filter(self, status=None, source_language=None,
+               target_language=None):
+        '''
+            Returns a new batch with the translations matching every given
+            value
+        '''
+        criteria = [(self.columns[field], value) for field, value in (
+            ('status', status), ('source_language', source_language),
+            ('target_language', target_language)) if value is not None]
+        indexes = [index for index in six.moves.range(len(self))
+                   if all(column[index] == value
+                          for column, value in criteria)]
+        return self._take(indexes)
+
+    def _group(self, keys):
+        groups = {}
+        for index, key in enumerate(keys):
+            groups.setdefault(key, []).append(index)
+        return dict((key, self._take(indexes))
+                    for key, indexes in six.iteritems(groups))
+
+    def group_by_status(self):
+        return self._group(self.columns['status'])
+
+    def group_by_language_pair(self):
+        '''
+            Returns a dict of (source_language, target_language) -> batch
+        '''
+        return self._group(self.language_pairs)
+
+
+class DocumentJob(object):
+    '''
+        A document translated as several chunks, one job each, tracked as
+        a single translation.
+
+        A chunk that could not be posted is None in ``chunks`` and its error
+        is in ``errors`` under its index. Its text is still in ``sources``,
+        so it can be posted again and put in its place.
+    '''
+    __slots__ = ('uid', 'chunks', 'separators', 'text_format', 'machine',
+                 'sources', 'errors')
+
+    def __init__(self, chunks, separators, text_format='text', uid=None,
+                 machine=False, sources=None, errors=None):
+        self.uid = uid
+        self.chunks = list(chunks)
+        self.separators = separators
+        self.text_format = text_format
+        self.machine = machine
+        self.sources = sources or [chunk.text for chunk in self.chunks]
+        self.errors = errors or {}
+
+    @property
+    def uids(self):
+        '''
+            Uids of the chunks that were posted
+        '''
+        return [chunk.uid for chunk in self.chunks if chunk is not None]
+
+    @property
+    def failed(self):
+        '''
+            Indexes of the chunks that could not be posted
+        '''
+        return [index for index, chunk in enumerate(self.chunks)
+                if chunk is None]
+
+    @property
+    def status(self):
+        '''
+            ``failed`` or ``canceled`` as soon as a chunk is, or could not
+            be posted, ``completed`` once every chunk is, otherwise the
+            status of the first pending chunk
+        '''
+        if self.failed:
+            return 'failed'
+        statuses = [chunk.status for chunk in self.chunks]
+        for status in ('failed', 'canceled'):
+            if status in statuses:
+                return status
+        for status in statuses:
+            if status != 'completed':
+                return status
+        return 'completed'
+
+    @property
+    def done(self):
+        return self.status in FINAL_STATUSES
+
+    @property
+    def text(self):
+        return join_chunks(self.sources, self.separators, self.text_format)
+
+    @property
+    def translation(self):
+        '''
+            The translated document, None until every chunk is translated
+        '''
+        translations = [chunk and chunk.translation for chunk in self.chunks]
+        if any(translation is None for translation in translations):
+            return None
+        return join_chunks(translations, self.separators, self.text_format)
+
+    @property
+    def price(self):
+        prices = [getattr(chunk, 'price', None) for chunk in self.chunks]
+        if any(price is None for price in prices):
+            return None
+        return sum(prices)
+
+    def update(self, translations):
+        '''
+            Replaces the chunks with the same uid as ``translations``
+        '''
+        by_uid = dict((translation.uid, translation)
+                      for translation in translations)
+        self.chunks = [chunk and by_uid.get(chunk.uid, chunk)
+                       for chunk in self.chunks]
+
+    def __repr__(self):
+        return "%s %s %s chunks" % (self.uid, self.status, len(self.chunks))
+
+    def __str__(self):
+        return "%s %s %s chunks" % (self.uid, self.status, len(self.chunks))
+
+
 class UnbabelApi(object):
-    def __init__(self, username, api_key, sandbox=False):
-        if sandbox:
-            api_url = UNBABEL_SANDBOX_API_URL
-        else:
-            api_url = UNBABEL_API_URL
+    def __init__(self, username, api_key, sandbox=False, session=None,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, cache=None, retry_policy=None,
+                 rate_limiter=None, codec=None, translation_memory=None,
+                 single_flight=False, compressor=None, api_url=None):
+        """
+        :param session: an existing ``requests.Session`` to send requests
+        through. When given, the pool settings below are ignored and the
+        session is not closed by :meth:`close`.
+        :param pool_connections: number of per-host connection pools to keep.
+        :param pool_maxsize: maximum number of connections kept alive per host.
+        :param pool_block: block when every connection of a host pool is in
+        use instead of opening extra, non-pooled connections.
+        :param keep_alive: reuse connections between requests.
+        :param cache: a ReferenceCache used for language pairs, tones and
+        topics. Without one, only the pairs checked by is_supported_pair are
+        kept, in memory, for ``DEFAULT_TTL`` seconds.
+        :param retry_policy: a RetryPolicy for failed requests. Translations
+        posted with retries enabled get a client generated ``uid`` so that a
+        retried POST does not create the job twice.
+        :param rate_limiter: a TokenBucket for this client only. By default
+        the process-wide limiter configured with ``set_rate_limit`` is used.
+        :param codec: the JsonCodec used for request and response bodies,
+        by default the fastest one installed.
+        :param translation_memory: a TranslationMemory consulted before
+        posting translations; only texts it has no completed translation
+        for are sent.
+        :param single_flight: make concurrent identical get_translation,
+        get_mt_translation and get_language_pairs calls share one request.
+        Coalescing counters are available from ``single_flight.stats()``.
+        :param compressor: a RequestCompressor compressing large request
+        bodies, e.g. bulk submissions.
+        :param api_url: base url of the API, e.g. a local FakeUnbabelServer,
+        instead of the production or sandbox one.
+        """
+        if api_url is None:
+            if sandbox:
+                api_url = UNBABEL_SANDBOX_API_URL
+            else:
+                api_url = UNBABEL_API_URL
         self.username = username
         self.api_key = api_key
         self.api_url = api_url
@@ -233,7 +578,143 @@ class UnbabelApi(object):
         self.headers = {
             'Authorization': 'ApiKey {}:{}'.format(self.username,
                                                    self.api_key),
-            'content-type': 'application/json'}
+            'content-type': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING}
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+        self._owns_session = session is None
+        if session is None:
+            session = self._create_session(pool_connections, pool_maxsize,
+                                           pool_block)
+        self.session = session
+        self.cache = cache
+        self._supported_pairs = {}
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.codec = codec or get_default_codec()
+        self.translation_memory = translation_memory
+        self.word_count_cache = WordCountCache()
+        self.word_count_estimator = WordCountEstimator()
+        self._hooks = {'before_request': [], 'after_response': [],
+                       'on_error': []}
+        self.single_flight = SingleFlight() if single_flight else None
+        self.compressor = compressor
+
+    @staticmethod
+    def _create_session(pool_connections, pool_maxsize, pool_block):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        '''
+            Releases the pooled connections held by this client
+        '''
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_hook(self, event, hook):
+        """
+        Registers ``hook`` to be called with a RequestEvent on ``event``:
+
+        * ``before_request``: before a call is sent.
+        * ``after_response``: once a response arrives, retries done.
+        * ``on_error``: when a call raises instead.
+        """
+        self._hooks[event].append(hook)
+
+    def remove_hook(self, event, hook):
+        self._hooks[event].remove(hook)
+
+    def _emit(self, name, event):
+        for hook in self._hooks[name]:
+            try:
+                hook(event)
+            except Exception:
+                log.exception('Error in {} hook'.format(name))
+
+    def _request(self, method, url, data=None, body=None):
+        if data is not None:
+            body = self.codec.dumps(data)
+        headers = self.headers
+        if self.compressor is not None:
+            body, encoding = self.compressor.compress(
+                endpoint_name(url, self.api_url), body)
+            if encoding is not None:
+                headers = dict(headers)
+                headers['Content-Encoding'] = encoding
+        if not any(six.itervalues(self._hooks)):
+            result = self._send(method, url, body, headers)
+            if self.compressor is not None:
+                self.compressor.observe_response(result)
+            return result
+
+        event = RequestEvent(method, url, endpoint_name(url, self.api_url),
+                             len(body) if body else 0)
+        self._emit('before_request', event)
+        start = default_timer()
+        try:
+            result = self._send(method, url, body, headers, event)
+        except Exception as e:
+            event.latency = default_timer() - start
+            event.error = e
+            self._emit('on_error', event)
+            raise
+        event.latency = default_timer() - start
+        event.status = result.status_code
+        event.response_bytes = len(result.content)
+        if self.compressor is not None:
+            self.compressor.observe_response(result)
+        self._emit('after_response', event)
+        return result
+
+    def _send(self, method, url, body, headers, event=None):
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            attempt += 1
+            if event is not None:
+                event.retries = attempt - 1
+            limiter = self.rate_limiter or get_rate_limiter()
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                result = self.session.request(method, url,
+                                              headers=headers, data=body)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if policy is None or not policy.should_retry(attempt):
+                    raise
+                delay = policy.backoff(attempt)
+                log.warning('Retrying {} {} in {:.2f}s after {!r}'.format(
+                    method, url, delay, e))
+            else:
+                if policy is None or not policy.should_retry(
+                        attempt, result.status_code):
+                    return result
+                delay = policy.backoff(attempt, parse_retry_after(
+                    result.headers.get('Retry-After')))
+                if result.status_code == 429 and limiter is not None:
+                    limiter.pause(delay)
+                log.warning('Retrying {} {} in {:.2f}s after status {}'.format(
+                    method, url, delay, result.status_code))
+            policy.sleep(delay)
+
+    def _decode(self, result):
+        return self.codec.loads(result.content)
+
+    def _ensure_uid(self, data):
+        if self.retry_policy is not None and 'uid' not in data:
+            data['uid'] = uuid.uuid4().hex
 
     def api_call(self, uri, data=None, internal_api_call=False):
         api_url = self.api_url
@@ -241,39 +722,55 @@ class UnbabelApi(object):
             api_url = api_url.replace('/tapi/v2/', '/api/v1/')
         url = "{}{}".format(api_url, uri)
         if data is None:
-            return requests.get(url, headers=self.headers)
-        return requests.post(url, headers=self.headers, data=json.dumps(data))
+            return self._request('GET', url)
+        return self._request('POST', url, data)
 
     def post_translations(self, text, target_language, source_language=None, type=None, tone=None, visibility=None,
                           public_url=None, callback_url=None, topics=None, instructions=None, uid=None,
                           text_format="text", target_text=None, origin=None, client_owner_email=None, context=None,
                           brand=None):
         data = {k: v for k, v in six.iteritems(locals()) if v not in (self, None)}
+        self._ensure_uid(data)
 
         if self.is_bulk:
             self.bulk_data.append(data)
             return
 
+        if self.translation_memory is not None:
+            return self._post_with_memory(
+                'translation', data, self._build_translation_object)
         return self._make_request(data)
 
     def post_mt_translations(self, text, target_language, source_language=None, tone=None, callback_url=None,
                              topics=None, instructions=None, uid=None, text_format="text", origin=None,
                              client_owner_email=None, brand=None):
         data = {k: v for k, v in six.iteritems(locals()) if v not in (self, None)}
-
-        result = requests.post("%smt_translation/" % self.api_url,
-                               headers=self.headers, data=json.dumps(data))
-        if result.status_code in (201, 202):
-            json_object = result.json()
-            toret = self._build_mt_translation_object(json_object)
-            return toret
-        elif result.status_code == 401:
-            raise UnauthorizedException(result.content)
-        elif result.status_code == 400:
-            raise BadRequestException(result.content)
-        else:
-            raise Exception("Unknown Error return status %d: %s",
-                            result.status_code, result.content[0:100])
+        self._ensure_uid(data)
+
+        if self.translation_memory is not None:
+            return self._post_with_memory(
+                'mt_translation', data, self._build_mt_translation_object)
+        result = self._request('POST', "%smt_translation/" % self.api_url,
+                               data)
+        return self._build_mt_translation_object(
+            self._translation_json(result))
+
+    def _post_with_memory(self, kind, data, build):
+        key = self.translation_memory.make_key(
+            kind, data['text'], data['target_language'],
+            data.get('source_language'), data.get('tone'),
+            data.get('topics'), data.get('text_format', 'text'))
+        json_object = self.translation_memory.lookup(key)
+        if json_object is None:
+            result = self._request('POST', "{}{}/".format(self.api_url, kind),
+                                   data)
+            json_object = self._translation_json(result)
+            self.translation_memory.remember(key, json_object)
+        return build(json_object)
+
+    def _record(self, json_object):
+        if self.translation_memory is not None:
+            self.translation_memory.record(json_object)
 
     def _build_translation_object(self, json_object):
         translators = [Translator.from_json(t) for t in
@@ -294,6 +791,7 @@ class UnbabelApi(object):
             origin=json_object.get('origin', None),
             price_plan=json_object.get('price_plan', None),
             client=json_object.get('client', None),
+            order_number=json_object.get('order_number', None),
             brand=json_object.get('brand', None)
         )
         return translation
@@ -319,21 +817,26 @@ class UnbabelApi(object):
         # headers={'Authorization': 'ApiKey %s:%s'%(self.username,
         # self.api_key),'content-type': 'application/json'}
         if self.is_bulk:
-            f = requests.patch
+            method = 'PATCH'
+        else:
+            method = 'POST'
+        result = self._request(method, "%stranslation/" % self.api_url, data)
+        return self._handle_translation_response(result, self.is_bulk)
+
+    def _handle_translation_response(self, result, bulk):
+        json_object = self._translation_json(result)
+        toret = None
+        if bulk:
+            toret = []
+            for obj in json_object['objects']:
+                toret.append(self._build_translation_object(obj))
         else:
-            f = requests.post
-        result = f("%stranslation/" % self.api_url, headers=self.headers,
-                   data=json.dumps(data))
+            toret = self._build_translation_object(json_object)
+        return toret
+
+    def _translation_json(self, result):
         if result.status_code in (201, 202):
-            json_object = result.json()
-            toret = None
-            if self.is_bulk:
-                toret = []
-                for obj in json_object['objects']:
-                    toret.append(self._build_translation_object(obj))
-            else:
-                toret = self._build_translation_object(json_object)
-            return toret
+            return self._decode(result)
         elif result.status_code == 401:
             raise UnauthorizedException(result.content)
         elif result.status_code == 400:
@@ -342,6 +845,35 @@ class UnbabelApi(object):
             raise Exception("Unknown Error return status %d: %s",
                             result.status_code, result.content[0:100])
 
+    def _post_bulk_batch(self, start, encoded_items):
+        try:
+            result = self._request('PATCH', "%stranslation/" % self.api_url,
+                                   body=build_body(encoded_items))
+            translations = self._handle_translation_response(result, True)
+            # Results are matched to the input by position only.
+            if len(translations) != len(encoded_items):
+                raise ValueError(
+                    'Bulk request of {} translations answered with {}'.format(
+                        len(encoded_items), len(translations)))
+        except Exception as e:
+            log.exception('Error posting bulk batch starting at %s', start)
+            return BatchResult(start, len(encoded_items), error=e)
+        return BatchResult(start, len(encoded_items), translations)
+
+    def _bulk_item(self, obj):
+        unknown = set(obj) - BULK_TRANSLATION_FIELDS
+        if unknown:
+            raise TypeError('Unexpected translation fields: {}'.format(
+                ', '.join(sorted(unknown))))
+        item = {'text': obj['text'],
+                'target_language': obj['target_language'],
+                'text_format': 'text'}
+        for key, value in six.iteritems(obj):
+            if value is not None:
+                item[key] = value
+        self._ensure_uid(item)
+        return item
+
     def start_bulk_transaction(self):
         self.bulk_data = []
         self.is_bulk = True
@@ -350,42 +882,281 @@ class UnbabelApi(object):
         data = {'objects': self.bulk_data}
         return self._make_request(data=data)
 
-    def post_bulk_translations(self, translations):
-        self.start_bulk_transaction()
-        for obj in translations:
-            obj = copy.deepcopy(obj)
-            text, target_language = obj['text'], obj['target_language']
-            del obj['text']
-            del obj['target_language']
-            self.post_translations(text, target_language, **obj)
-
-        return self._post_bulk()
+    def post_bulk_translations(self, translations,
+                               batch_size=DEFAULT_BATCH_SIZE,
+                               batch_bytes=DEFAULT_BATCH_BYTES, workers=1,
+                               report=False, as_batch=False):
+        """
+        Requests several translations, splitting them in as many requests as
+        needed to respect ``batch_size`` items and ``batch_bytes`` encoded
+        bytes per request.
+
+        :param workers: number of batches sent concurrently.
+        :param report: return the BulkReport with the outcome of every batch
+        instead of raising BulkTranslationException when some of them fail.
+        :param as_batch: return a TranslationBatch instead of a list.
+        :return: the Translation objects in the same order as the input.
+
+        A list or tuple is checked whole before anything is sent. When an
+        item of any other iterable turns out to be invalid, the exception
+        raised carries the BulkReport of the batches already sent as its
+        ``report`` attribute.
+        """
+        submitter = BulkSubmitter(self, batch_size, batch_bytes, workers)
+        try:
+            with submitter:
+                encoded_items = (submitter.encode(obj)
+                                 for obj in translations)
+                if isinstance(translations, (list, tuple)):
+                    # Every item is checked before the first batch is sent.
+                    encoded_items = list(encoded_items)
+                for encoded in encoded_items:
+                    submitter.add_encoded(encoded)
+        except Exception as e:
+            # Batches may already be sent, the caller needs their uids.
+            e.report = submitter.report()
+            raise
+        bulk_report = submitter.report()
+        if report:
+            return bulk_report
+        if not bulk_report.ok:
+            failed = bulk_report.failed
+            if len(bulk_report.batches) == 1:
+                raise failed[0].error
+            raise BulkTranslationException(bulk_report)
+        if as_batch:
+            return TranslationBatch.from_objects(bulk_report.translations)
+        return bulk_report.translations
+
+    def post_document(self, text, target_language, machine=False,
+                      max_chars=DEFAULT_MAX_CHUNK_CHARS,
+                      workers=DEFAULT_DOCUMENT_WORKERS, uid=None,
+                      text_format="text", **kwargs):
+        """
+        Requests the translation of a long text split in chunks of at most
+        ``max_chars`` characters, cut at paragraph and sentence boundaries
+        (between elements for html and trans-units for xliff), which are
+        posted ``workers`` at a time and translated independently.
+
+        :param machine: post machine translations instead of human ones.
+        :param uid: uid of the document, chunk ``n`` is posted with uid
+        ``<uid>-<n>``.
+        :param kwargs: other arguments of post_translations or
+        post_mt_translations.
+        :return: a DocumentJob, whose ``translation`` is the reassembled
+        document once every chunk is translated.
+        :raises DocumentTranslationException: when some chunks could not be
+        posted, with the DocumentJob of the others, which are already
+        requested.
+        """
+        if self.is_bulk:
+            raise ValueError('Documents cannot be posted in a bulk '
+                             'transaction')
+        chunks, separators = split_document(text, text_format, max_chars)
+        post = self.post_mt_translations if machine else \
+            self.post_translations
+
+        def post_chunk(index):
+            chunk_uid = None if uid is None else '{}-{}'.format(uid, index)
+            return post(chunks[index], target_language, uid=chunk_uid,
+                        text_format=text_format, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(post_chunk, index)
+                       for index in range(len(chunks))]
+        translations, errors = [], {}
+        for index, future in enumerate(futures):
+            error = future.exception()
+            if error is not None:
+                log.error('Error posting chunk %s of document %s: %r',
+                          index, uid, error)
+                errors[index] = error
+            translations.append(None if error else future.result())
+        job = DocumentJob(translations, separators, text_format, uid=uid,
+                          machine=machine, sources=chunks, errors=errors)
+        if errors:
+            raise DocumentTranslationException(job)
+        return job
+
+    def get_document(self, job, workers=DEFAULT_DOCUMENT_WORKERS):
+        '''
+            Refreshes the chunks of a DocumentJob and returns it
+        '''
+        get = self.get_mt_translation if job.machine else \
+            self.get_translation
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            job.update(list(executor.map(get, job.uids)))
+        return job
 
-    def get_translations(self, status=None):
+    def wait_for_document(self, job, timeout=None, **kwargs):
+        '''
+            Blocks until every chunk of a DocumentJob is done and returns it.
+            Accepts the arguments of as_completed.
         '''
-            Returns the translations requested by the user
+        if not job.machine:
+            job.update(self.wait_for_translations(job.uids, timeout=timeout,
+                                                  **kwargs))
+            return job
+        deadline = None if timeout is None else time.time() + timeout
+        interval = kwargs.get('min_interval', DEFAULT_MIN_POLL_INTERVAL)
+        while not self.get_document(job).done:
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TranslationTimeoutException(
+                        [chunk.uid for chunk in job.chunks
+                         if chunk.status not in FINAL_STATUSES])
+                interval = min(interval, remaining)
+            time.sleep(interval)
+        return job
+
+    def get_translations(self, status=None, as_batch=False):
+        '''
+            Returns the translations requested by the user, as a
+            TranslationBatch when ``as_batch`` is set
         '''
         if status is not None:
             result = self.api_call('translation/?status=%s' % status)
         else:
             result = self.api_call('translation/')
         if result.status_code == 200:
-            translations_json = result.json()["objects"]
-            translations = [Translation(**tj) for tj in translations_json]
+            translations_json = self._decode(result)["objects"]
+            for tj in translations_json:
+                self._record(tj)
+            translations = (self._build_translation_object(tj)
+                            for tj in translations_json)
         else:
             log.critical(
                 'Error status when fetching translation from server: {}!'.format(
                     result.status_code))
             translations = []
-        return translations
+        if as_batch:
+            return TranslationBatch.from_objects(translations)
+        return list(translations)
+
+    def _fetch_page(self, url):
+        result = self._request('GET', url)
+        if result.status_code != 200:
+            log.critical(
+                'Error status when fetching page {} from server: {}!'.format(
+                    url, result.status_code))
+            raise ValueError(result.content)
+        return self._decode(result)
+
+    def _iter_objects(self, uri, status=None, page_size=DEFAULT_PAGE_SIZE,
+                      uids=None, filters=None):
+        params = [('limit', page_size)]
+        if status is not None:
+            params.append(('status', status))
+        if uids is not None:
+            params.append(('uid__in', ','.join(uids)))
+        if filters:
+            params.extend(sorted(six.iteritems(filters)))
+        url = "{}{}?{}".format(self.api_url, uri, urlencode(params))
+        # The next page is requested while the current one is consumed.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._fetch_page, url)
+            while future is not None:
+                page = future.result()
+                next_url = (page.get('meta') or {}).get('next')
+                future = None
+                if next_url:
+                    future = executor.submit(
+                        self._fetch_page, urljoin(self.api_url, next_url))
+                for obj in page['objects']:
+                    yield obj
+
+    def iter_translations(self, status=None, page_size=DEFAULT_PAGE_SIZE,
+                          uids=None):
+        '''
+            Lazily iterates over the translations requested by the user,
+            following the server pagination. ``uids`` restricts the listing
+            to the given translations.
+        '''
+        for obj in self._iter_objects('translation/', status, page_size,
+                                      uids):
+            self._record(obj)
+            yield self._build_translation_object(obj)
+
+    def as_completed(self, uids, timeout=None, statuses=FINAL_STATUSES,
+                     batch_size=DEFAULT_WATCH_BATCH_SIZE,
+                     min_interval=DEFAULT_MIN_POLL_INTERVAL,
+                     max_interval=DEFAULT_MAX_POLL_INTERVAL):
+        """
+        Yields each translation of ``uids`` as soon as it reaches one of
+        ``statuses``.
+
+        Every polling round lists the pending uids ``batch_size`` at a time,
+        filtered by status, instead of fetching them one by one. Rounds are
+        spaced between ``min_interval`` and ``max_interval`` seconds: the
+        fewer translations are pending the sooner the next round, and the
+        interval grows while nothing completes.
+
+        :raises TranslationTimeoutException: when ``timeout`` seconds go by
+        with translations still pending.
+        """
+        pending, seen = [], set()
+        for uid in uids:
+            if uid not in seen:
+                seen.add(uid)
+                pending.append(uid)
+        total = len(pending)
+        deadline = None if timeout is None else time.time() + timeout
+        interval = min_interval
+        while pending:
+            done = {}
+            for start in six.moves.range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                for status in statuses:
+                    for translation in self.iter_translations(
+                            status=status, uids=batch):
+                        if translation.uid in batch:
+                            done.setdefault(translation.uid, translation)
+            for uid in pending:
+                if uid in done:
+                    yield done[uid]
+            pending = [uid for uid in pending if uid not in done]
+            if not pending:
+                return
+            if done:
+                interval = min_interval + (
+                    max_interval - min_interval) * len(pending) / float(total)
+            else:
+                interval = min(max_interval, interval * 1.5)
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TranslationTimeoutException(pending)
+                interval = min(interval, remaining)
+            time.sleep(interval)
+
+    def wait_for_translations(self, uids, timeout=None, **kwargs):
+        '''
+            Blocks until every translation is done and returns them in the
+            order of ``uids``. Accepts the arguments of as_completed.
+        '''
+        done = dict((translation.uid, translation) for translation in
+                    self.as_completed(uids, timeout=timeout, **kwargs))
+        return [done[uid] for uid in uids]
+
+    def _coalesce(self, key, func, *args):
+        if self.single_flight is None:
+            return func(*args)
+        return self.single_flight.do(key, func, *args)
 
     def get_translation(self, uid):
         '''
             Returns a translation with the given id
         '''
+        return self._coalesce(('translation', uid), self._get_translation,
+                              uid)
+
+    def _get_translation(self, uid):
         result = self.api_call('translation/{}/'.format(uid))
         if result.status_code == 200:
-            translation = Translation(**result.json())
+            json_object = self._decode(result)
+            self._record(json_object)
+            translation = self._build_translation_object(json_object)
         else:
             log.critical(
                 'Error status when fetching translation from server: {}!'.format(
@@ -404,34 +1175,56 @@ class UnbabelApi(object):
         uri = 'mt_translation/{}/'.format(uid)
         url = "{}{}".format(api_url, uri)
         data = {"status": "upgrade", "properties": properties}
-        return requests.patch(url, headers=self.headers, data=json.dumps(data))
+        return self._request('PATCH', url, data)
 
-    def get_mt_translations(self, status=None):
+    def get_mt_translations(self, status=None, as_batch=False):
         '''
-            Returns the translations requested by the user
+            Returns the translations requested by the user, as a
+            TranslationBatch when ``as_batch`` is set
         '''
         if status is not None:
             result = self.api_call('mt_translation/?status=%s' % status)
         else:
             result = self.api_call('mt_translation/')
         if result.status_code == 200:
-            translations_json = result.json()["objects"]
-            translations = [Translation(**tj) for tj in translations_json]
+            translations_json = self._decode(result)["objects"]
+            for tj in translations_json:
+                self._record(tj)
+            translations = (self._build_mt_translation_object(tj)
+                            for tj in translations_json)
         else:
             log.critical(
                 'Error status when fetching machine translation from server: '
                 '{}!'.format(
                     result.status_code))
             translations = []
-        return translations
+        if as_batch:
+            return TranslationBatch.from_objects(translations,
+                                                 model=MTTranslation)
+        return list(translations)
+
+    def iter_mt_translations(self, status=None, page_size=DEFAULT_PAGE_SIZE):
+        '''
+            Lazily iterates over the machine translations requested by the
+            user, following the server pagination
+        '''
+        for obj in self._iter_objects('mt_translation/', status, page_size):
+            self._record(obj)
+            yield self._build_mt_translation_object(obj)
 
     def get_mt_translation(self, uid):
         '''
-            Returns a translation with the given id
+            Returns the machine translation with the given id
         '''
+        return self._coalesce(('mt_translation', uid),
+                              self._get_mt_translation, uid)
+
+    def _get_mt_translation(self, uid):
         result = self.api_call('mt_translation/{}/'.format(uid))
         if result.status_code == 200:
-            translation = Translation(**result.json())
+            json_object = self._decode(result)
+            self._record(json_object)
+            translation = self._build_mt_translation_object(json_object)
         else:
             log.critical(
                 'Error status when fetching machine translation from server: '
@@ -440,17 +1233,33 @@ class UnbabelApi(object):
             raise ValueError(result.content)
         return translation
 
+    def _load_reference_json(self, uri):
+        return self._decode(self.api_call(uri))
+
+    def _get_reference_json(self, uri):
+        if self.cache is None:
+            return self._load_reference_json(uri)
+        return self.cache.get(
+            "{}{}".format(self.api_url, uri),
+            lambda: self._load_reference_json(uri),
+            cacheable=lambda value: 'error' not in value)
+
+    def _get_language_pairs_json(self, train_langs=None):
+        if train_langs is None:
+            return self._get_reference_json('language_pair/')
+        return self._get_reference_json(
+            'language_pair/?train_langs={}'.format(train_langs))
+
     def get_language_pairs(self, train_langs=None):
         '''
             Returns the language pairs available on unbabel
         '''
-        if train_langs is None:
-            result = self.api_call('language_pair/')
-        else:
-            result = self.api_call(
-                'language_pair/?train_langs={}'.format(train_langs))
+        return self._coalesce(('language_pair', train_langs),
+                              self._get_language_pairs, train_langs)
+
+    def _get_language_pairs(self, train_langs=None):
         try:
-            langs_json = result.json()
+            langs_json = self._get_language_pairs_json(train_langs)
             if 'error' in langs_json:
                 return []
             languages = [LangPair(Language(
@@ -467,12 +1276,37 @@ class UnbabelApi(object):
             raise e
         return languages
 
+    def is_supported_pair(self, source_language, target_language,
+                          train_langs=None):
+        '''
+            Tells whether unbabel translates between the given shortnames
+        '''
+        pair = (source_language, target_language)
+        cached = self._supported_pairs.get(train_langs)
+        # Without a cache the set itself is kept for DEFAULT_TTL, with one
+        # it is rebuilt whenever the cache hands back fresh pairs.
+        if self.cache is None and cached is not None and \
+                cached[2] is not None and \
+                time.time() - cached[2] < DEFAULT_TTL:
+            return pair in cached[1]
+        langs_json = self._get_language_pairs_json(train_langs)
+        if cached is None or cached[0] is not langs_json:
+            pairs, fetched_at = set(), None
+            if 'error' not in langs_json:
+                pairs = set(
+                    (lang_json["lang_pair"]["source_language"]["shortname"],
+                     lang_json["lang_pair"]["target_language"]["shortname"])
+                    for lang_json in langs_json["objects"])
+                fetched_at = time.time()
+            cached = (langs_json, pairs, fetched_at)
+            self._supported_pairs[train_langs] = cached
+        return pair in cached[1]
+
     def get_tones(self):
         '''
             Returns the tones available on unbabel
         '''
-        result = self.api_call('tone/')
-        tones_json = result.json()
+        tones_json = self._get_reference_json('tone/')
         tones = [Tone(name=tone_json["tone"]["name"],
                       description=tone_json["tone"]["description"])
                  for tone_json in tones_json["objects"]]
@@ -482,15 +1316,14 @@ class UnbabelApi(object):
         '''
             Returns the topics available on unbabel
         '''
-        result = self.api_call('topic/')
-        topics_json = result.json()
+        topics_json = self._get_reference_json('topic/')
         topics = [Topic(name=topic_json["topic"]["name"])
                   for topic_json in topics_json["objects"]]
         return topics
 
     def get_account(self):
         result = self.api_call('account/')
-        account_json = result.json()
+        account_json = self._decode(result)
         account_data = account_json['objects'][0]['account']
         account = Account(**account_data)
         return account
@@ -499,17 +1332,53 @@ class UnbabelApi(object):
         result = self.api_call('wordcount/', {"text": text})
 
         if result.status_code == 201:
-            json_object = result.json()
+            json_object = self._decode(result)
+            self.word_count_estimator.calibrate(text, json_object["word_count"])
             return json_object["word_count"]
         else:
             log.debug('Got a HTTP Error [{}]'.format(result.status_code))
             raise Exception("Unknown Error")
 
+    def get_word_counts(self, texts, workers=DEFAULT_WORD_COUNT_WORKERS,
+                        estimate=False):
+        """
+        Returns the word count of every text, in order.
+
+        Counts are cached by text hash and each distinct uncached text is
+        requested once, ``workers`` at a time. With ``estimate`` set the
+        uncached texts are counted offline by the word count estimator,
+        which is calibrated with every count the server returns.
+        """
+        texts = list(texts)
+        keys = [text_key(text) for text in texts]
+        counts = {}
+        missing = OrderedDict()
+        for key, text in zip(keys, texts):
+            if key in counts or key in missing:
+                continue
+            count = self.word_count_cache.get(key)
+            if count is None:
+                missing[key] = text
+            else:
+                counts[key] = count
+
+        if estimate:
+            for key, text in six.iteritems(missing):
+                counts[key] = self.word_count_estimator.estimate(text)
+        elif missing:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = executor.map(self.get_word_count,
+                                       list(missing.values()))
+                for key, count in zip(list(missing), fetched):
+                    self.word_count_cache.set(key, count)
+                    counts[key] = count
+        return [counts[key] for key in keys]
+
     def get_user(self):
         result = self.api_call('app/user/', internal_api_call=True)
 
         if result.status_code == 200:
-            return result.json()
+            return self._decode(result)
         else:
             log.debug('Got a HTTP Error [{}]'.format(result.status_code))
             raise Exception("Unknown Error: %s" % result.status_code)
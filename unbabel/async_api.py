@@ -0,0 +1,119 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from unbabel.api import UnbabelApi
+from unbabel.singleflight import AsyncSingleFlight
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+
+class AsyncUnbabelApi(object):
+    '''
+        asyncio flavour of :class:`unbabel.api.UnbabelApi`.
+
+        Every coroutine runs the matching blocking call of a wrapped
+        ``UnbabelApi`` on a dedicated thread pool, so responses go through the
+        same connection pool and the same object builders as the sync client.
+        Concurrency is still thread-bound: each request in flight occupies
+        one of the ``max_concurrency`` threads of the pool and further calls
+        wait for a free one. With ``single_flight`` set, concurrent identical
+        translation and language pair reads share one request.
+
+        An ``api`` passed in is left open by :meth:`close`, like the
+        ``session`` of UnbabelApi.
+    '''
+
+    def __init__(self, username, api_key, sandbox=False,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, api=None,
+                 single_flight=False, **kwargs):
+        self._owns_api = api is None
+        if api is None:
+            kwargs.setdefault('pool_maxsize', max_concurrency)
+            api = UnbabelApi(username, api_key, sandbox=sandbox, **kwargs)
+        self.api = api
+        self.max_concurrency = max_concurrency
+        # The pool size is what bounds the requests in flight.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.single_flight = AsyncSingleFlight() if single_flight else None
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _coalesce(self, key, func, *args):
+        if self.single_flight is None:
+            return await self._call(func, *args)
+        return await self.single_flight.do(key, self._call, func, *args)
+
+    async def close(self):
+        # Waiting for the running calls blocks, so it is done off the loop.
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True))
+        if self._owns_api:
+            self.api.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def post_translations(self, text, target_language, **kwargs):
+        return await self._call(self.api.post_translations, text,
+                                target_language, **kwargs)
+
+    async def post_mt_translations(self, text, target_language, **kwargs):
+        return await self._call(self.api.post_mt_translations, text,
+                                target_language, **kwargs)
+
+    async def post_bulk_translations(self, translations, **kwargs):
+        return await self._call(self.api.post_bulk_translations,
+                                translations, **kwargs)
+
+    async def post_document(self, text, target_language, **kwargs):
+        return await self._call(self.api.post_document, text,
+                                target_language, **kwargs)
+
+    async def get_document(self, job):
+        return await self._call(self.api.get_document, job)
+
+    async def get_translations(self, status=None, as_batch=False):
+        return await self._call(self.api.get_translations, status, as_batch)
+
+    async def get_translation(self, uid):
+        return await self._coalesce(('translation', uid),
+                                    self.api.get_translation, uid)
+
+    async def get_mt_translations(self, status=None, as_batch=False):
+        return await self._call(self.api.get_mt_translations, status,
+                                as_batch)
+
+    async def get_mt_translation(self, uid):
+        return await self._coalesce(('mt_translation', uid),
+                                    self.api.get_mt_translation, uid)
+
+    async def upgrade_mt_translation(self, uid, properties=None):
+        return await self._call(self.api.upgrade_mt_translation, uid,
+                                properties)
+
+    async def get_language_pairs(self, train_langs=None):
+        return await self._coalesce(('language_pair', train_langs),
+                                    self.api.get_language_pairs, train_langs)
+
+    async def get_tones(self):
+        return await self._call(self.api.get_tones)
+
+    async def get_topics(self):
+        return await self._call(self.api.get_topics)
+
+    async def get_account(self):
+        return await self._call(self.api.get_account)
+
+    async def get_word_count(self, text):
+        return await self._call(self.api.get_word_count, text)
+
+
+__all__ = ['AsyncUnbabelApi']
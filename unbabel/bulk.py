@@ -0,0 +1,243 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger()
+
+# Upper bounds for a single ``PATCH translation/`` request.
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+DEFAULT_WORKERS = 4
+
+_BODY_HEAD = b'{"objects": ['
+_BODY_TAIL = b']}'
+_SEPARATOR = b', '
+
+
+def build_body(encoded_items):
+    '''
+        Joins already encoded items into a bulk request body
+    '''
+    return _BODY_HEAD + _SEPARATOR.join(encoded_items) + _BODY_TAIL
+
+
+class BatchResult(object):
+    def __init__(self, start, size, translations=None, error=None,
+                 uids=None):
+        self.start = start
+        self.size = size
+        self.translations = translations
+        self.error = error
+        if uids is None and translations is not None:
+            uids = [translation.uid for translation in translations]
+        self.uids = uids
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def without_translations(self):
+        '''
+            Returns a copy keeping only the uids of the translations
+        '''
+        return BatchResult(self.start, self.size, error=self.error,
+                           uids=self.uids)
+
+    def __repr__(self):
+        return "batch %s-%s %s" % (
+            self.start, self.start + self.size,
+            'ok' if self.ok else 'failed: %r' % (self.error,))
+
+
+class BulkReport(object):
+    '''
+        Outcome of a bulk submission, one BatchResult per request sent
+    '''
+
+    def __init__(self, batches):
+        self.batches = sorted(batches, key=lambda batch: batch.start)
+
+    @property
+    def ok(self):
+        return all(batch.ok for batch in self.batches)
+
+    @property
+    def succeeded(self):
+        return [batch for batch in self.batches if batch.ok]
+
+    @property
+    def failed(self):
+        return [batch for batch in self.batches if not batch.ok]
+
+    @property
+    def translations(self):
+        '''
+            Translations in input order, None for items of failed batches
+            and of batches whose translations were not kept
+        '''
+        translations = []
+        for batch in self.batches:
+            if batch.ok and batch.translations is not None:
+                translations.extend(batch.translations)
+            else:
+                translations.extend([None] * batch.size)
+        return translations
+
+    @property
+    def uids(self):
+        '''
+            Uids in input order, None for items of failed batches
+        '''
+        uids = []
+        for batch in self.batches:
+            if batch.ok:
+                uids.extend(batch.uids)
+            else:
+                uids.extend([None] * batch.size)
+        return uids
+
+    def __repr__(self):
+        return "%s batches, %s failed" % (len(self.batches), len(self.failed))
+
+
+class BulkSubmitter(object):
+    """
+    Streams translation requests into bulk submissions.
+
+    Items can be added one at a time with :meth:`add`, from several threads,
+    or consumed from any iterable with :meth:`submit_all`. Each item is
+    encoded as soon as it is added and only its bytes are buffered. A batch
+    is sent as soon as it holds ``batch_size`` items or ``batch_bytes``
+    bytes. Batches are sent by ``workers`` threads, and adding items blocks
+    while ``max_pending`` batches are waiting to be sent.
+
+    The BatchResult of every batch is kept for the final BulkReport. To
+    bound memory over an input of any size, pass ``on_batch``, called with
+    each BatchResult as soon as its batch is answered, and set
+    ``keep_translations`` to False so that only the uids and errors of the
+    batches are kept.
+
+    :param api: the UnbabelApi used to send the batches.
+    """
+
+    def __init__(self, api, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_bytes=DEFAULT_BATCH_BYTES, workers=DEFAULT_WORKERS,
+                 max_pending=None, on_batch=None, keep_translations=True):
+        self.api = api
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.on_batch = on_batch
+        self.keep_translations = keep_translations
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = threading.BoundedSemaphore(max_pending or workers * 2)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffer_start = 0
+        self._count = 0
+        self._results = []
+        self._results_lock = threading.Lock()
+
+    def add(self, item):
+        """
+        Queues one translation request, a dict with the arguments of
+        ``UnbabelApi.post_translations``.
+        """
+        self.add_encoded(self.encode(item))
+
+    def encode(self, item):
+        '''
+            Checks and encodes one translation request
+        '''
+        return self.api.codec.dumps(self.api._bulk_item(item))
+
+    def add_encoded(self, encoded):
+        '''
+            Queues one translation request returned by encode
+        '''
+        with self._lock:
+            item_size = len(encoded) + (len(_SEPARATOR) if self._buffer
+                                        else 0)
+            if self._buffer and (
+                    len(self._buffer) >= self.batch_size or
+                    self._buffer_size + item_size > self.batch_bytes):
+                self._flush_locked()
+                item_size = len(encoded)
+            if not self._buffer:
+                self._buffer_start = self._count
+                self._buffer_size = len(_BODY_HEAD) + len(_BODY_TAIL)
+            self._buffer.append(encoded)
+            self._buffer_size += item_size
+            self._count += 1
+
+    def _flush_locked(self):
+        batch, start = self._buffer, self._buffer_start
+        self._buffer = []
+        # Blocks the producers while too many batches are waiting.
+        self._pending.acquire()
+        try:
+            future = self._executor.submit(self.api._post_bulk_batch, start,
+                                           batch)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(self._batch_done)
+
+    def _batch_done(self, future):
+        try:
+            result = future.result()
+            if self.on_batch is not None:
+                try:
+                    self.on_batch(result)
+                except Exception:
+                    log.exception('Error in bulk batch callback for %r',
+                                  result)
+            if not self.keep_translations:
+                result = result.without_translations()
+            # Only the result is kept, the future and its batch are dropped.
+            with self._results_lock:
+                self._results.append(result)
+        finally:
+            self._pending.release()
+
+    def flush(self):
+        '''
+            Sends the items buffered so far without waiting for a full batch
+        '''
+        with self._lock:
+            if self._buffer:
+                self._flush_locked()
+
+    def submit_all(self, items):
+        '''
+            Adds every item of ``items`` and returns the BulkReport once all
+            of them are sent
+        '''
+        for item in items:
+            self.add(item)
+        return self.close()
+
+    def close(self):
+        '''
+            Sends what is left, waits for every batch and returns the
+            BulkReport
+        '''
+        self.flush()
+        self._executor.shutdown(wait=True)
+        return self.report()
+
+    def report(self):
+        '''
+            Returns the BulkReport of the batches sent so far
+        '''
+        with self._results_lock:
+            return BulkReport(self._results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+log = logging.getLogger()
+
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class ReferenceCache(object):
+    '''
+        TTL cache for rarely changing API data such as language pairs, tones
+        and topics.
+
+        Entries are kept in memory and, when ``path`` is given, also as JSON
+        files in that directory so several processes share them. Once an
+        entry expires the stale value keeps being served while a background
+        thread fetches a fresh one, so callers only block on the very first
+        load of a key.
+    '''
+
+    def __init__(self, ttl=DEFAULT_TTL, path=None, clock=time.time):
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _filename(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '%s.json' % digest)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._filename(key)) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        return entry['fetched_at'], entry['value']
+
+    def _write_disk(self, key, fetched_at, value):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': key, 'fetched_at': fetched_at,
+                           'value': value}, f)
+            os.replace(tmp, self._filename(key))
+        except (IOError, OSError):
+            log.exception('Error persisting cache entry %s', key)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _store(self, key, value):
+        fetched_at = self.clock()
+        with self._lock:
+            self._entries[key] = (fetched_at, value)
+        if self.path is not None:
+            self._write_disk(key, fetched_at, value)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if self.path is not None and (entry is None or self._expired(entry)):
+            # Another process may have refreshed the entry in the meantime.
+            disk_entry = self._read_disk(key)
+            if disk_entry is not None and (
+                    entry is None or disk_entry[0] > entry[0]):
+                entry = disk_entry
+                with self._lock:
+                    self._entries[key] = entry
+        return entry
+
+    def _expired(self, entry):
+        return self.clock() - entry[0] >= self.ttl
+
+    def _load(self, key, loader, cacheable):
+        value = loader()
+        if cacheable is None or cacheable(value):
+            self._store(key, value)
+        return value
+
+    def _refresh(self, key, loader, cacheable):
+        try:
+            self._load(key, loader, cacheable)
+        except Exception:
+            log.exception('Error refreshing cache entry %s', key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, loader, cacheable=None):
+        """
+        :param loader: callable fetching the value when it is not cached.
+        :param cacheable: optional predicate telling whether a loaded value
+        may be stored, used to keep error payloads out of the cache.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            return self._load(key, loader, cacheable)
+        if self._expired(entry):
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                thread = threading.Thread(target=self._refresh,
+                                          args=(key, loader, cacheable))
+                thread.daemon = True
+                thread.start()
+        return entry[1]
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                keys = list(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key]
+                self._entries.pop(key, None)
+        if self.path is not None:
+            for k in keys:
+                if os.path.exists(self._filename(k)):
+                    os.remove(self._filename(k))
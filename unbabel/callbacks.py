@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from six.moves.urllib.parse import parse_qs
+
+from unbabel.api import UnbabelApi
+
+log = logging.getLogger()
+
+DEFAULT_WORKERS = 4
+# Callbacks nobody waits for yet are kept for late waiters, up to this many.
+DEFAULT_MAX_RESULTS = 10000
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class CallbackReceiver(object):
+    """
+    Receives the requests Unbabel sends to a ``callback_url``.
+
+    Each payload is turned into a Translation (or an MTTranslation when
+    ``mt`` is set) with the builders of UnbabelApi. The registered handlers
+    are then called on a worker pool and the future of that uid is
+    resolved. The receiver is a WSGI application and can also be served
+    with :meth:`serve` or, from asyncio code, :meth:`serve_async`.
+
+    Futures are only kept while someone waits on them. The last
+    ``max_results`` callbacks are remembered so that a waiter registering
+    after its callback arrived still gets it.
+    """
+
+    def __init__(self, api=None, workers=DEFAULT_WORKERS, mt=False,
+                 max_results=DEFAULT_MAX_RESULTS):
+        self.api = api or UnbabelApi(None, None)
+        self.mt = mt
+        self.max_results = max_results
+        self._handlers = []
+        self._futures = {}
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def add_handler(self, handler):
+        '''
+            Registers a callable receiving every completed translation
+        '''
+        self._handlers.append(handler)
+        return handler
+
+    def future(self, uid):
+        '''
+            Returns the concurrent.futures.Future resolved with the
+            translation of ``uid`` once its callback arrives
+        '''
+        with self._lock:
+            future = self._results.get(uid)
+            if future is not None and not future.cancelled():
+                self._results[uid] = self._results.pop(uid)
+                return future
+            future = self._futures.get(uid)
+            if future is None or future.cancelled():
+                future = self._futures[uid] = Future()
+            return future
+
+    def forget(self, uid):
+        with self._lock:
+            self._futures.pop(uid, None)
+            self._results.pop(uid, None)
+
+    async def wait(self, uid, timeout=None):
+        # Shielded so that a timeout does not cancel the future other
+        # waiters and the next dispatch share.
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(self.future(uid))), timeout)
+
+    def parse(self, body, content_type=''):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        if 'json' in content_type:
+            payload = json.loads(body)
+        else:
+            payload = dict((key, values[0]) for key, values in
+                           parse_qs(body, keep_blank_values=True).items())
+        if 'translatedText' not in payload and 'translated_text' in payload:
+            payload['translatedText'] = payload.pop('translated_text')
+        payload.setdefault('text', '')
+        if self.mt:
+            return self.api._build_mt_translation_object(payload)
+        return self.api._build_translation_object(payload)
+
+    def _run_handler(self, handler, translation):
+        try:
+            handler(translation)
+        except Exception:
+            log.exception('Error in callback handler for %s', translation.uid)
+
+    def dispatch(self, translation):
+        uid = translation.uid
+        with self._lock:
+            future = self._futures.pop(uid, None)
+            if future is None:
+                future = self._results.pop(uid, None)
+            if future is None or future.cancelled():
+                future = Future()
+            self._results[uid] = future
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        if not future.done():
+            future.set_result(translation)
+        for handler in self._handlers:
+            self._executor.submit(self._run_handler, handler, translation)
+
+    def _handle(self, method, body, content_type):
+        if method != 'POST':
+            return '405 Method Not Allowed'
+        try:
+            translation = self.parse(body, content_type)
+        except (ValueError, KeyError):
+            log.exception('Error parsing callback payload')
+            return '400 Bad Request'
+        self.dispatch(translation)
+        return '200 OK'
+
+    def __call__(self, environ, start_response):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length) if length else b''
+        status = self._handle(environ['REQUEST_METHOD'], body,
+                              environ.get('CONTENT_TYPE', ''))
+        start_response(status, [('Content-Type', 'text/plain')])
+        return [status.encode('utf-8')]
+
+    wsgi_app = __call__
+
+    def serve(self, host='127.0.0.1', port=0):
+        '''
+            Serves the receiver from a background thread and returns the
+            server, whose ``server_port`` tells the port actually bound
+        '''
+        server = make_server(host, port, self,
+                             server_class=_ThreadingWSGIServer,
+                             handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+            parts = request_line.decode('latin-1').split()
+            method = parts[0] if parts else ''
+            status = self._handle(method, body,
+                                  headers.get('content-type', ''))
+            writer.write(
+                'HTTP/1.1 {}\r\nContent-Type: text/plain\r\n'
+                'Content-Length: {}\r\nConnection: close\r\n\r\n{}'.format(
+                    status, len(status), status).encode('latin-1'))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve_async(self, host='127.0.0.1', port=0):
+        '''
+            Starts serving on the running event loop and returns the
+            asyncio Server
+        '''
+        return await asyncio.start_server(self._handle_connection, host,
+                                          port)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
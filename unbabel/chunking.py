@@ -0,0 +1,265 @@
+import re
+from itertools import chain
+
+DEFAULT_MAX_CHUNK_CHARS = 5000
+
+# Preferred split points for plain text, from best to worst.
+_TEXT_BOUNDARIES = (
+    re.compile(r'\n[ \t]*\n\s*'),
+    re.compile(u'(?<=[.!?\u3002\uff01\uff1f])\\s+'),
+    re.compile(r'\s+'),
+)
+_SENTENCE_BOUNDARY = _TEXT_BOUNDARIES[1]
+_WORD_BOUNDARY = _TEXT_BOUNDARIES[2]
+
+_TAG_RE = re.compile(r'<!--.*?-->|<[^>]*>', re.S)
+_TAG_NAME_RE = re.compile(r'</?\s*([a-zA-Z0-9:-]+)')
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'))
+_BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'body', 'dd', 'div', 'dl',
+    'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'head', 'header', 'hr', 'html', 'li', 'main',
+    'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'ul'))
+
+_XLIFF_BODY_RE = re.compile(r'<body\b[^>]*>(.*)</body>', re.S)
+_XLIFF_UNIT_RE = re.compile(r'<trans-unit\b.*?</trans-unit>', re.S)
+
+
+class _Pieces(object):
+    '''
+        Text cut into [content, separator, hard] pieces. Separators are kept
+        out of the chunks sent for translation and a hard separator, markup
+        closing or opening an element, always ends a chunk.
+    '''
+
+    def __init__(self):
+        # The first piece holds no content, only what precedes the first
+        # real piece.
+        self.items = [['', '', False]]
+
+    def add(self, content):
+        self.items.append([content, '', False])
+
+    def glue(self, separator, hard=False):
+        last = self.items[-1]
+        last[1] += separator
+        last[2] = last[2] or hard
+
+
+def _split_text(text, max_chars, pieces, level=0):
+    if len(text) <= max_chars:
+        pieces.add(text)
+        return
+    if level == len(_TEXT_BOUNDARIES):
+        for start in range(0, len(text), max_chars):
+            pieces.glue('', hard=True)
+            pieces.add(text[start:start + max_chars])
+        pieces.glue('', hard=True)
+        return
+    # Units that fit are packed together, the parts of those that do not
+    # are never merged with their neighbours, so a chunk only ends inside
+    # a paragraph when the paragraph is too long on its own.
+    units = _Pieces()
+    position = 0
+    for match in chain(_TEXT_BOUNDARIES[level].finditer(text), [None]):
+        end = len(text) if match is None else match.start()
+        if end > position:
+            _split_text(text[position:end], max_chars, units, level + 1)
+        if match is not None:
+            units.glue(match.group())
+            position = match.end()
+    chunks, separators = _pack(units, max_chars)
+    pieces.glue(separators[0], hard=True)
+    for chunk, separator in zip(chunks, separators[1:]):
+        pieces.add(chunk)
+        pieces.glue(separator, hard=True)
+
+
+def _tag_name(tag):
+    match = _TAG_NAME_RE.match(tag)
+    return match.group(1).lower() if match else None
+
+
+def _html_nodes(html):
+    '''
+        Yields the top-level nodes of an html fragment as (markup, tag name,
+        open tag, close tag) tuples, tag name being None for text runs
+    '''
+    depth, start, name, open_tag = 0, 0, None, None
+    position = 0
+    for match in _TAG_RE.finditer(html):
+        tag = match.group()
+        tag_name = _tag_name(tag)
+        if depth == 0:
+            if match.start() > position:
+                yield html[position:match.start()], None, None, None
+            position = match.start()
+        if tag.startswith('<!--') or tag_name is None or tag.endswith('/>') \
+                or tag_name in _VOID_TAGS:
+            if depth == 0:
+                yield tag, tag_name, tag, None
+                position = match.end()
+            continue
+        if tag.startswith('</'):
+            if depth == 0:
+                # Closes nothing we know of, kept as it is.
+                yield tag, tag_name, tag, None
+                position = match.end()
+                continue
+            depth -= 1
+            if depth == 0:
+                yield html[start:match.end()], name, open_tag, tag
+                name = None
+                position = match.end()
+            continue
+        if depth == 0:
+            start, name, open_tag = match.start(), tag_name, tag
+        depth += 1
+    if position < len(html):
+        yield html[position:], None, None, None
+
+
+def _split_run(run, max_chars, pieces):
+    '''
+        Splits inline html at the sentence boundaries found outside tags
+    '''
+    stripped = run.strip()
+    lead = run[:len(run) - len(run.lstrip())]
+    pieces.glue(lead)
+    if len(stripped) <= max_chars:
+        pieces.add(stripped)
+    else:
+        # Boundaries are only looked for in the text between top-level
+        # nodes, so every piece keeps its inline markup balanced.
+        masked = []
+        for markup, name, _, _ in _html_nodes(stripped):
+            masked.append(markup if name is None else 'x' * len(markup))
+        masked = ''.join(masked)
+        position = 0
+        for boundary in (_SENTENCE_BOUNDARY, _WORD_BOUNDARY):
+            matches = list(boundary.finditer(masked))
+            if matches:
+                break
+        for match in chain(matches, [None]):
+            end = len(stripped) if match is None else match.start()
+            pieces.add(stripped[position:end])
+            if match is not None:
+                pieces.glue(match.group())
+                position = match.end()
+    pieces.glue(run[len(lead) + len(stripped):])
+
+
+def _split_html(html, max_chars, pieces):
+    run = []
+    for markup, name, open_tag, close_tag in chain(_html_nodes(html),
+                                                   [(None,) * 4]):
+        if markup is not None and (name is None or
+                                   name not in _BLOCK_TAGS):
+            run.append(markup)
+            continue
+        if run:
+            joined = ''.join(run)
+            if joined.strip():
+                _split_run(joined, max_chars, pieces)
+            else:
+                pieces.glue(joined)
+            run = []
+        if markup is None:
+            break
+        if len(markup) <= max_chars or close_tag is None:
+            pieces.add(markup)
+        else:
+            # Too big to be sent whole: its tags stay out of the chunks and
+            # its content is split on its own.
+            pieces.glue(open_tag, hard=True)
+            _split_html(markup[len(open_tag):-len(close_tag)], max_chars,
+                        pieces)
+            pieces.glue(close_tag, hard=True)
+
+
+def _pack(pieces, max_chars):
+    chunks, separators = [], [pieces.items[0][1]]
+    content, separator, hard = None, '', False
+    for piece, piece_separator, piece_hard in pieces.items[1:]:
+        if content is not None and not hard and \
+                len(content) + len(separator) + len(piece) <= max_chars:
+            content += separator + piece
+        else:
+            if content is not None:
+                chunks.append(content)
+                separators.append(separator)
+            content = piece
+        separator, hard = piece_separator, piece_hard
+    if content is not None:
+        chunks.append(content)
+        separators.append(separator)
+    return chunks, separators
+
+
+def _split_xliff(xliff, max_chars):
+    body = _XLIFF_BODY_RE.search(xliff)
+    if body is None:
+        return [xliff], ['', '']
+    head, tail = xliff[:body.start(1)], xliff[body.end(1):]
+    inner = body.group(1)
+    pieces = _Pieces()
+    position = 0
+    for unit in _XLIFF_UNIT_RE.finditer(inner):
+        pieces.glue(inner[position:unit.start()])
+        pieces.add(unit.group())
+        position = unit.end()
+    pieces.glue(inner[position:])
+    chunks, separators = _pack(pieces, max(1, max_chars - len(head) -
+                                           len(tail)))
+    if not chunks:
+        return [xliff], ['', '']
+    return [head + chunk + tail for chunk in chunks], separators
+
+
+def split_document(text, text_format='text',
+                   max_chars=DEFAULT_MAX_CHUNK_CHARS):
+    """
+    Splits ``text`` in chunks of at most ``max_chars`` characters, cutting
+    plain text between paragraphs, then sentences, then words, html between
+    elements and sentences of top-level text, and xliff between trans-units.
+    A single html element or trans-unit that does not fit is kept whole.
+
+    :return: ``(chunks, separators)`` where ``separators`` holds what comes
+    before, between and after the chunks, to be given to :func:`join_chunks`.
+    """
+    if text_format == 'xliff':
+        return _split_xliff(text, max_chars)
+    if not text.strip():
+        return [text], ['', '']
+    pieces = _Pieces()
+    if text_format == 'html':
+        _split_html(text, max_chars, pieces)
+    else:
+        stripped = text.strip()
+        lead = text[:len(text) - len(text.lstrip())]
+        pieces.glue(lead)
+        _split_text(stripped, max_chars, pieces)
+        pieces.glue(text[len(lead) + len(stripped):])
+    return _pack(pieces, max_chars)
+
+
+def join_chunks(chunks, separators, text_format='text'):
+    '''
+        Rebuilds a document from its (translated) chunks and the separators
+        returned by split_document
+    '''
+    if text_format == 'xliff':
+        bodies = [_XLIFF_BODY_RE.search(chunk) for chunk in chunks]
+        if all(bodies):
+            first = bodies[0]
+            chunks = [body.group(1).strip() for body in bodies]
+            return first.string[:first.start(1)] + join_chunks(
+                chunks, separators) + first.string[first.end(1):]
+    parts = [separators[0]]
+    for chunk, separator in zip(chunks, separators[1:]):
+        parts.append(chunk)
+        parts.append(separator)
+    return ''.join(parts)
@@ -0,0 +1,210 @@
+"""
+Converts resource files to xliff and back, in parallel.
+
+    unbabel-xliff to-xliff SOURCE_DIR OUTPUT_DIR [-s en] [-t pt]
+    unbabel-xliff from-xliff SOURCE_DIR OUTPUT_DIR [--side source]
+
+JSON files must hold a flat object of id -> string. Files ending in
+.properties or .txt hold one ``id=string`` per line, blank lines and lines
+starting with # or ! are ignored. ``name.json`` becomes ``name.json.xlf``
+and converting back drops the ``.xlf`` suffix and restores the original
+format. Files that cannot be converted are reported and make the command
+exit with status 1, the others are still converted.
+"""
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from unbabel.xliff_converter import iter_xliff_units, write_xliff
+
+XLIFF_SUFFIX = '.xlf'
+TEMP_SUFFIX = '.tmp'
+JSON_SUFFIXES = ('.json',)
+KEY_VALUE_SUFFIXES = ('.properties', '.txt')
+
+
+def _read_key_values(path):
+    with io.open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] in '#!':
+                continue
+            key, _, value = line.partition('=')
+            yield key.strip(), value.strip()
+
+
+def _read_entries(path):
+    if path.endswith(JSON_SUFFIXES):
+        with io.open(path, encoding='utf-8') as f:
+            return list(json.load(f).items())
+    return _read_key_values(path)
+
+
+def _write_json(units, f):
+    f.write(u'{')
+    for index, (key, value) in enumerate(units):
+        f.write(u'%s\n  %s: %s' % (u',' if index else u'',
+                                   json.dumps(key), json.dumps(value)))
+    f.write(u'\n}\n')
+
+
+def _write_key_values(units, f):
+    for key, value in units:
+        f.write(u'%s=%s\n' % (key, value))
+
+
+@contextmanager
+def _replacing(destination):
+    '''
+        Opens a file that takes the place of ``destination`` once written, so
+        a failed conversion leaves no partial output behind
+    '''
+    tmp = destination + TEMP_SUFFIX
+    try:
+        with io.open(tmp, 'w', encoding='utf-8') as f:
+            yield f
+        os.replace(tmp, destination)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def to_xliff(source, destination, source_language='', target_language=''):
+    with _replacing(destination) as f:
+        write_xliff(_read_entries(source), f, source_language,
+                    target_language)
+
+
+def from_xliff(source, destination, side='target'):
+    units = ((_id, target if side == 'target' and target is not None
+              else unit_source)
+             for _id, unit_source, target in iter_xliff_units(source))
+    with _replacing(destination) as f:
+        if destination.endswith(JSON_SUFFIXES):
+            _write_json(units, f)
+        else:
+            _write_key_values(units, f)
+
+
+def _convert(job):
+    '''
+        Returns (source, destination, bytes, error), error being None or
+        the message of what went wrong
+    '''
+    command, source, destination, options = job
+    try:
+        parent = os.path.dirname(destination)
+        if parent and not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                if not os.path.isdir(parent):
+                    raise
+        if command == 'to-xliff':
+            to_xliff(source, destination, **options)
+        else:
+            from_xliff(source, destination, **options)
+    except Exception as e:
+        return source, destination, 0, '{}: {}'.format(type(e).__name__, e)
+    return source, destination, os.path.getsize(source), None
+
+
+def find_jobs(command, source_dir, output_dir, options):
+    '''
+        Returns the conversions to run, sorted by source path
+    '''
+    if command == 'to-xliff':
+        suffixes = JSON_SUFFIXES + KEY_VALUE_SUFFIXES
+    else:
+        suffixes = (XLIFF_SUFFIX,)
+    jobs = []
+    for root, _, files in os.walk(source_dir):
+        for name in files:
+            if not name.endswith(suffixes):
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, source_dir)
+            if command == 'to-xliff':
+                relative += XLIFF_SUFFIX
+            else:
+                relative = relative[:-len(XLIFF_SUFFIX)]
+            jobs.append((command, source, os.path.join(output_dir, relative),
+                         options))
+    return sorted(jobs, key=lambda job: job[1])
+
+
+def run(command, source_dir, output_dir, options, workers=None, out=None,
+        err=None):
+    '''
+        Converts every file and returns (files, bytes, seconds, failures),
+        failures being the (source, error) of the files not converted
+    '''
+    out = out or sys.stdout
+    err = err or sys.stderr
+    jobs = find_jobs(command, source_dir, output_dir, options)
+    start = time.time()
+    total_bytes = 0
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map keeps the input order whatever order the files finish in.
+        for source, destination, size, error in executor.map(
+                _convert, jobs, chunksize=max(1, len(jobs) // 64)):
+            if error is not None:
+                failures.append((source, error))
+                print('error: %s: %s' % (source, error), file=err)
+                continue
+            total_bytes += size
+            print('%s -> %s' % (source, destination), file=out)
+    return (len(jobs) - len(failures), total_bytes, time.time() - start,
+            failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='unbabel-xliff', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of processes, all cores by default')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    to_parser = subparsers.add_parser('to-xliff',
+                                      help='resource files to xliff')
+    to_parser.add_argument('source_dir')
+    to_parser.add_argument('output_dir')
+    to_parser.add_argument('-s', '--source-language', default='')
+    to_parser.add_argument('-t', '--target-language', default='')
+
+    from_parser = subparsers.add_parser('from-xliff',
+                                        help='xliff to resource files')
+    from_parser.add_argument('source_dir')
+    from_parser.add_argument('output_dir')
+    from_parser.add_argument('--side', choices=('target', 'source'),
+                             default='target')
+
+    args = parser.parse_args(argv)
+    if args.command == 'to-xliff':
+        options = {'source_language': args.source_language,
+                   'target_language': args.target_language}
+    else:
+        options = {'side': args.side}
+
+    files, total_bytes, elapsed, failures = run(
+        args.command, args.source_dir, args.output_dir, options, args.workers)
+    elapsed = max(elapsed, 1e-9)
+    print('%d files, %.2f MB in %.2fs (%.1f files/s, %.2f MB/s), '
+          '%d failed' % (files, total_bytes / 1e6, elapsed, files / elapsed,
+                         total_bytes / 1e6 / elapsed, len(failures)),
+          file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import json
+
+
+class JsonCodec(object):
+    '''
+        Encodes request bodies to bytes and decodes response bodies with the
+        standard library json module
+    '''
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+_default_codec = None
+
+
+def get_default_codec():
+    '''
+        Returns the fastest codec whose backend is installed, falling back to
+        the standard library
+    '''
+    global _default_codec
+    if _default_codec is None:
+        for codec_class in (OrjsonCodec, UjsonCodec):
+            try:
+                _default_codec = codec_class()
+                break
+            except ImportError:
+                continue
+        else:
+            _default_codec = JsonCodec()
+    return _default_codec
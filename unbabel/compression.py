@@ -0,0 +1,78 @@
+import threading
+import zlib
+
+DEFAULT_THRESHOLD = 8 * 1024
+DEFAULT_ENDPOINTS = ('translation/', 'mt_translation/')
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class RequestCompressor(object):
+    """
+    Compresses request bodies bigger than ``threshold`` bytes sent to
+    ``endpoints`` (endpoint names as in ``translation/``, or None for every
+    endpoint) and keeps track of the bytes this saves, both for requests and
+    for compressed responses.
+
+    :param encoding: ``gzip`` or ``deflate``.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, encoding='gzip',
+                 endpoints=DEFAULT_ENDPOINTS, level=6):
+        if encoding not in ('gzip', 'deflate'):
+            raise ValueError('Unsupported encoding: {}'.format(encoding))
+        self.threshold = threshold
+        self.encoding = encoding
+        self.endpoints = None if endpoints is None else frozenset(endpoints)
+        self.level = level
+        self.requests_compressed = 0
+        self.request_bytes_saved = 0
+        self.response_bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def _compress(self, body):
+        if self.encoding == 'deflate':
+            return zlib.compress(body, self.level)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+
+    def compress(self, endpoint, body):
+        '''
+            Returns the body to send and its Content-Encoding, None when it
+            is sent as is
+        '''
+        if not body or len(body) < self.threshold or (
+                self.endpoints is not None and
+                endpoint not in self.endpoints):
+            return body, None
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        compressed = self._compress(body)
+        if len(compressed) >= len(body):
+            return body, None
+        with self._lock:
+            self.requests_compressed += 1
+            self.request_bytes_saved += len(body) - len(compressed)
+        return compressed, self.encoding
+
+    def observe_response(self, response):
+        '''
+            Accounts for the bytes saved by a compressed response, which
+            requests decodes while reading it
+        '''
+        if not response.headers.get('Content-Encoding'):
+            return
+        try:
+            transferred = int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self.response_bytes_saved += max(
+                0, len(response.content) - transferred)
+
+    def stats(self):
+        return {
+            'requests_compressed': self.requests_compressed,
+            'request_bytes_saved': self.request_bytes_saved,
+            'response_bytes_saved': self.response_bytes_saved,
+        }
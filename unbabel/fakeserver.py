@@ -0,0 +1,385 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit
+
+API_PREFIX = '/tapi/v2/'
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+
+# Fields the client model objects are built from, anything else posted is
+# accepted but not echoed back.
+TRANSLATION_FIELDS = ('uid', 'text', 'translatedText', 'target_language',
+                      'source_language', 'status', 'topics', 'price',
+                      'text_format', 'origin', 'client', 'brand')
+
+LANGUAGES = OrderedDict((('en', 'English'), ('pt', 'Portuguese'),
+                         ('fr', 'French'), ('es', 'Spanish'),
+                         ('de', 'German'), ('it', 'Italian')))
+TONES = (('Informal', 'Informal style'), ('Friendly', 'Friendly style'),
+         ('Business', 'Business style'), ('Formal', 'Formal style'))
+TOPICS = ('politics', 'technology', 'sports', 'finance')
+
+
+def constant_latency(seconds):
+    return lambda rng: seconds
+
+
+def uniform_latency(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+def exponential_latency(mean):
+    return lambda rng: rng.expovariate(1.0 / mean) if mean else 0.0
+
+
+def lognormal_latency(median, sigma=0.5):
+    '''
+        Long tailed latency, half of the requests take less than ``median``
+        seconds
+    '''
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def _now():
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+
+class FakeUnbabelServer(object):
+    """
+    Local stand-in for the Unbabel API, for exercising the client over a
+    real network stack.
+
+    It implements ``translation/``, ``mt_translation/``, ``language_pair/``,
+    ``tone/``, ``topic/``, ``wordcount/`` and ``account/`` in memory. Jobs
+    are ``new`` when created and ``completed`` once ``complete_after``
+    seconds went by (never when None), translated by ``translate(text,
+    target_language)``, which returns the text unchanged by default.
+    Listings are paginated like the real API, accept the ``status``,
+    ``uid__in`` and ``modified__gte`` filters and are sorted by the
+    ``order_by`` fields (``-field`` for descending) in creation order
+    otherwise.
+
+    :param latency: seconds every response is delayed by, or a function of
+    a ``random.Random`` returning them, see ``*_latency``.
+    :param endpoint_latency: dict of endpoint (``translation``, ...) to
+    latency, overriding ``latency``.
+    :param error_rate: fraction of requests answered with a 500.
+    :param throttle_rate: fraction of requests answered with a 429 and a
+    ``Retry-After`` of ``retry_after`` seconds.
+    """
+
+    def __init__(self, latency=0, endpoint_latency=None, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1,
+                 page_size=DEFAULT_PAGE_SIZE, complete_after=0,
+                 translate=None, seed=None):
+        self.latency = latency
+        self.endpoint_latency = endpoint_latency or {}
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.complete_after = complete_after
+        self.translate = translate or (lambda text, target_language: text)
+        self.requests = Counter()
+        self.statuses = Counter()
+        self._jobs = {'translation': OrderedDict(),
+                      'mt_translation': OrderedDict()}
+        self._created = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}{}'.format(host, port, API_PREFIX)
+
+    def start(self, host='127.0.0.1', port=0):
+        '''
+            Serves from a background thread, ``api_url`` tells where
+        '''
+        self._server = _ThreadingHTTPServer((host, port), _Handler)
+        self._server.fake = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def client(self, **kwargs):
+        '''
+            Returns an UnbabelApi talking to this server
+        '''
+        from unbabel.api import UnbabelApi
+        return UnbabelApi('fake', 'fake', api_url=self.api_url, **kwargs)
+
+    def stats(self):
+        return {'requests': dict(self.requests),
+                'statuses': dict(self.statuses)}
+
+    def _delay(self, endpoint):
+        latency = self.endpoint_latency.get(endpoint, self.latency)
+        with self._lock:
+            if callable(latency):
+                latency = latency(self._random)
+            draw = self._random.random()
+        return max(0.0, latency), draw
+
+    def handle(self, method, path, headers, body):
+        '''
+            Answers one request, returns (status, headers, json body)
+        '''
+        parts = urlsplit(path)
+        pairs = parse_qsl(parts.query)
+        query = dict(pairs)
+        order_by = [value for name, value in pairs if name == 'order_by']
+        if order_by:
+            query['order_by'] = order_by
+        route = parts.path[len(API_PREFIX):].strip('/').split('/') \
+            if parts.path.startswith(API_PREFIX) else ['']
+        endpoint = route[0]
+        delay, draw = self._delay(endpoint)
+        time.sleep(delay)
+        with self._lock:
+            self.requests[(method, endpoint)] += 1
+
+        if not (headers.get('Authorization') or '').startswith('ApiKey '):
+            response = 401, {}, {'error': 'Unauthorized'}
+        elif draw < self.throttle_rate:
+            response = 429, {'Retry-After': str(self.retry_after)}, {
+                'error': 'Too many requests'}
+        elif draw < self.throttle_rate + self.error_rate:
+            response = 500, {}, {'error': 'Internal server error'}
+        else:
+            try:
+                response = self._route(method, route, query,
+                                       self._load(headers, body))
+            except ValueError as e:
+                response = 400, {}, {'error': str(e)}
+        with self._lock:
+            self.statuses[response[0]] += 1
+        return response
+
+    @staticmethod
+    def _load(headers, body):
+        if not body:
+            return None
+        encoding = headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        return json.loads(body.decode('utf-8'))
+
+    def _route(self, method, route, query, data):
+        endpoint, uid = route[0], (route[1] if len(route) > 1 else None)
+        if endpoint in self._jobs:
+            if uid is not None:
+                if method == 'GET':
+                    return self._get(endpoint, uid)
+                if method == 'PATCH':
+                    return self._patch(endpoint, uid, data or {})
+            elif method == 'GET':
+                return self._list(endpoint, query)
+            elif method == 'POST':
+                return 201, {}, self._create(endpoint, data or {})
+            elif method == 'PATCH' and endpoint == 'translation':
+                return 202, {}, {'objects': [
+                    self._create(endpoint, obj)
+                    for obj in (data or {}).get('objects', [])]}
+        elif method == 'GET' and endpoint == 'language_pair':
+            return 200, {}, {'objects': [
+                {'lang_pair': {
+                    'source_language': {'shortname': source, 'name': name},
+                    'target_language': {'shortname': target,
+                                        'name': LANGUAGES[target]}}}
+                for source, name in LANGUAGES.items()
+                for target in LANGUAGES if target != source]}
+        elif method == 'GET' and endpoint == 'tone':
+            return 200, {}, {'objects': [
+                {'tone': {'name': name, 'description': description}}
+                for name, description in TONES]}
+        elif method == 'GET' and endpoint == 'topic':
+            return 200, {}, {'objects': [{'topic': {'name': name}}
+                                         for name in TOPICS]}
+        elif method == 'POST' and endpoint == 'wordcount':
+            text = (data or {}).get('text', '')
+            return 201, {}, {'text': text, 'word_count': len(text.split())}
+        elif method == 'GET' and endpoint == 'account':
+            return 200, {}, {'objects': [{'account': {
+                'username': 'fake', 'email': 'fake@example.com',
+                'balance': 1000.0}}]}
+        return 404, {}, {'error': 'Not found'}
+
+    def _create(self, endpoint, data):
+        if 'text' not in data or 'target_language' not in data:
+            raise ValueError('text and target_language are required')
+        uid = data.get('uid') or uuid.uuid4().hex
+        with self._lock:
+            jobs = self._jobs[endpoint]
+            # A known uid is a retried request, it gets the job back.
+            if uid not in jobs:
+                job = dict((field, data[field]) for field in TRANSLATION_FIELDS
+                           if data.get(field) is not None)
+                job.update(uid=uid, status='new', modified=_now())
+                job.setdefault('source_language', 'en')
+                job.setdefault('text_format', 'text')
+                if endpoint == 'translation':
+                    job['price'] = len(data['text'].split())
+                jobs[uid] = job
+                self._created[uid] = time.time()
+            return self._view(jobs[uid])
+
+    def _view(self, job):
+        '''
+            Completes the job when its time has come, under the lock
+        '''
+        if job['status'] == 'new' and self.complete_after is not None and \
+                time.time() - self._created[job['uid']] >= \
+                self.complete_after:
+            job.update(status='completed', modified=_now(),
+                       translatedText=self.translate(
+                           job['text'], job['target_language']))
+        return dict((field, job[field]) for field in TRANSLATION_FIELDS
+                    if field in job)
+
+    def _get(self, endpoint, uid):
+        with self._lock:
+            job = self._jobs[endpoint].get(uid)
+            if job is None:
+                return 404, {}, {'error': 'Not found'}
+            return 200, {}, self._view(job)
+
+    def _patch(self, endpoint, uid, data):
+        with self._lock:
+            job = self._jobs[endpoint].get(uid)
+            if job is None:
+                return 404, {}, {'error': 'Not found'}
+            if data.get('status'):
+                job.update(status=data['status'], modified=_now())
+            return 202, {}, self._view(job)
+
+    def _list(self, endpoint, query):
+        limit = min(int(query.get('limit', self.page_size)), MAX_PAGE_SIZE)
+        offset = int(query.get('offset', 0))
+        uids = set(query['uid__in'].split(',')) if 'uid__in' in query \
+            else None
+        with self._lock:
+            objects = []
+            for job in self._jobs[endpoint].values():
+                view = self._view(job)
+                # Listings carry the modification time used as sync cursor.
+                view['modified'] = job['modified']
+                if uids is not None and job['uid'] not in uids:
+                    continue
+                if query.get('status') and view['status'] != query['status']:
+                    continue
+                if query.get('modified__gte') and \
+                        job['modified'] < query['modified__gte']:
+                    continue
+                objects.append(view)
+        # Sorting by the last key first keeps the earlier keys in charge.
+        for field in reversed(query.get('order_by') or []):
+            name = field.lstrip('-')
+            objects.sort(key=lambda obj: (obj.get(name) is None,
+                                          obj.get(name)),
+                         reverse=field.startswith('-'))
+        page = objects[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(objects):
+            params = dict(query, limit=limit, offset=offset + limit)
+            next_url = '{}{}/?{}'.format(
+                API_PREFIX, endpoint,
+                urlencode(sorted(params.items()), doseq=True))
+        return 200, {}, {'meta': {'limit': limit, 'offset': offset,
+                                  'total_count': len(objects),
+                                  'next': next_url},
+                         'objects': page}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under load.
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keeps connections open so the client pool behaves as in production.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, Nagle would hold the body
+    # back until the client acknowledges the headers.
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, payload = self.server.fake.handle(
+            self.command, self.path, self.headers, body)
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serves a fake Unbabel API until interrupted')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='median of a log-normal latency')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args(argv)
+    latency = lognormal_latency(args.latency_ms / 1000.0) \
+        if args.latency_ms else 0
+    server = FakeUnbabelServer(latency=latency, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate,
+                               page_size=args.page_size)
+    server.start(args.host, args.port)
+    print('Serving on {}'.format(server.api_url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
+
+
+__all__ = ['FakeUnbabelServer', 'constant_latency', 'uniform_latency',
+           'exponential_latency', 'lognormal_latency']
@@ -0,0 +1,225 @@
+"""
+Drives an UnbabelApi at a target request rate and reports latencies.
+
+    python -m unbabel.loadtest --operation get_translation --rps 200 \\
+        --duration 10 [--url http://host/tapi/v2/] [--latency-ms 20]
+
+Without ``--url`` the requests go to a FakeUnbabelServer started in the
+same process, configured by the ``--latency-ms``, ``--error-rate`` and
+``--throttle-rate`` options.
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+
+DEFAULT_WORKERS = 32
+
+
+def _post_translation(api):
+    return lambda index: api.post_translations(
+        u'Load test request number {}.'.format(index), 'pt',
+        source_language='en')
+
+
+def _post_mt_translation(api):
+    return lambda index: api.post_mt_translations(
+        u'Load test request number {}.'.format(index), 'pt',
+        source_language='en')
+
+
+def _get_translation(api):
+    uid = api.post_translations(u'Load test.', 'pt',
+                                source_language='en').uid
+    return lambda index: api.get_translation(uid)
+
+
+def _iter_translations(api):
+    return lambda index: list(api.iter_translations())
+
+
+def _get_language_pairs(api):
+    return lambda index: api.get_language_pairs()
+
+
+def _get_word_count(api):
+    return lambda index: api.get_word_count(
+        u'Load test request number {}.'.format(index))
+
+
+def _get_account(api):
+    return lambda index: api.get_account()
+
+
+# Each operation is set up once with the client and then called with the
+# number of the request.
+OPERATIONS = {
+    'post_translation': _post_translation,
+    'post_mt_translation': _post_mt_translation,
+    'get_translation': _get_translation,
+    'iter_translations': _iter_translations,
+    'get_language_pairs': _get_language_pairs,
+    'get_word_count': _get_word_count,
+    'get_account': _get_account,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1,
+                max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LoadReport(object):
+    '''
+        Outcome of a load test. Latencies are in seconds and measured from
+        the time each request was due, so time spent waiting for a free
+        worker counts.
+    '''
+
+    def __init__(self, target_rps, duration, latencies, errors):
+        self.target_rps = target_rps
+        self.duration = duration
+        self.latencies = sorted(latencies)
+        self.errors = errors
+
+    @property
+    def requests(self):
+        return len(self.latencies) + sum(self.errors.values())
+
+    @property
+    def throughput(self):
+        '''
+            Successful requests per second
+        '''
+        return len(self.latencies) / self.duration if self.duration else 0.0
+
+    def percentile(self, fraction):
+        return percentile(self.latencies, fraction)
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'errors': dict(self.errors),
+            'target_rps': self.target_rps,
+            'throughput': self.throughput,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'p999': self.percentile(0.999),
+            'max': self.latencies[-1] if self.latencies else None,
+        }
+
+    def __repr__(self):
+        def ms(value):
+            return '-' if value is None else '%.1fms' % (value * 1000)
+        return ('%s requests, %s errors, %.1f/%.1f rps, p50 %s p90 %s '
+                'p99 %s max %s' % (
+                    self.requests, sum(self.errors.values()),
+                    self.throughput, self.target_rps,
+                    ms(self.percentile(0.5)), ms(self.percentile(0.9)),
+                    ms(self.percentile(0.99)),
+                    ms(self.latencies[-1] if self.latencies else None)))
+
+
+def run_load(api, operation, rps, duration, workers=DEFAULT_WORKERS):
+    """
+    Calls ``operation`` (a name of OPERATIONS or a function of the client
+    returning the function to call) ``rps`` times per second during
+    ``duration`` seconds, from ``workers`` threads.
+
+    Requests are started on a fixed schedule whatever the time the previous
+    ones take, so a slow server shows up as growing latencies rather than as
+    a lower request rate.
+
+    :return: a LoadReport.
+    """
+    if not callable(operation):
+        operation = OPERATIONS[operation]
+    call = operation(api)
+    latencies, errors = [], Counter()
+    lock = threading.Lock()
+
+    def timed(index, due):
+        try:
+            call(index)
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] += 1
+        else:
+            latency = default_timer() - due
+            with lock:
+                latencies.append(latency)
+
+    total = int(rps * duration)
+    start = default_timer()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index in range(total):
+            due = start + index / float(rps)
+            delay = due - default_timer()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(timed, index, due)
+    return LoadReport(rps, default_timer() - start, latencies, errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--operation', default='get_translation',
+                        choices=sorted(OPERATIONS))
+    parser.add_argument('--rps', type=float, default=100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--url', help='api url, a local fake server '
+                                      'by default')
+    parser.add_argument('--username', default='fake')
+    parser.add_argument('--api-key', default='fake')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='median latency of the fake server')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retries', type=int, default=0,
+                        help='attempts after a failed request')
+    args = parser.parse_args(argv)
+
+    from unbabel.api import UnbabelApi
+    from unbabel.fakeserver import FakeUnbabelServer, lognormal_latency
+    from unbabel.retry import RetryPolicy
+
+    server = None
+    url = args.url
+    if url is None:
+        latency = lognormal_latency(args.latency_ms / 1000.0) \
+            if args.latency_ms else 0
+        server = FakeUnbabelServer(latency=latency,
+                                   error_rate=args.error_rate,
+                                   throttle_rate=args.throttle_rate,
+                                   retry_after=0).start()
+        url = server.api_url
+    retry_policy = RetryPolicy(max_attempts=args.retries + 1) \
+        if args.retries else None
+    api = UnbabelApi(args.username, args.api_key, api_url=url,
+                     pool_maxsize=args.workers, retry_policy=retry_policy)
+    try:
+        report = run_load(api, args.operation, args.rps, args.duration,
+                          args.workers)
+    finally:
+        api.close()
+        if server is not None:
+            server.stop()
+    print(report)
+    if server is not None:
+        print(server.stats(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 100000
+COMPLETED_STATUS = 'completed'
+# Statuses after which a pending submission will never complete.
+ABANDONED_STATUSES = ('failed', 'canceled')
+
+
+class TranslationMemory(object):
+    """
+    Local SQLite store of completed translations, used by UnbabelApi to skip
+    submitting a text that was already translated with the same settings.
+
+    Entries are indexed by a hash of the whitespace-normalized text, the
+    language pair, tone, topics and text format. Submissions still waiting
+    to complete are kept as pending and count towards ``max_entries``, past
+    which the least recently used entries and oldest pending ones are
+    evicted.
+    """
+
+    def __init__(self, path=':memory:', max_entries=DEFAULT_MAX_ENTRIES,
+                 clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, payload TEXT NOT NULL, '
+                'last_used REAL NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS entries_last_used '
+                'ON entries (last_used)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS pending ('
+                'uid TEXT PRIMARY KEY, key TEXT NOT NULL, '
+                'created REAL NOT NULL DEFAULT 0)')
+            columns = [row[1] for row in self._connection.execute(
+                'PRAGMA table_info(pending)')]
+            if 'created' not in columns:
+                self._connection.execute(
+                    'ALTER TABLE pending ADD COLUMN created REAL NOT NULL '
+                    'DEFAULT 0')
+
+    @staticmethod
+    def make_key(kind, text, target_language, source_language=None,
+                 tone=None, topics=None, text_format='text'):
+        '''
+            ``kind`` keeps human and machine translations apart
+        '''
+        normalized = ' '.join(text.split())
+        if isinstance(topics, (list, tuple)):
+            topics = sorted(topics)
+        material = json.dumps([kind, normalized, source_language,
+                               target_language, tone, topics, text_format])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        '''
+            Returns the stored translation payload for ``key`` or None
+        '''
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT payload FROM entries WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._connection:
+                self._connection.execute(
+                    'UPDATE entries SET last_used = ? WHERE key = ?',
+                    (self.clock(), key))
+        return json.loads(row[0])
+
+    def store(self, key, payload):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, payload, last_used) '
+                'VALUES (?, ?, ?)', (key, json.dumps(payload), self.clock()))
+            self._evict()
+
+    def _evict(self):
+        count = self._connection.execute(
+            'SELECT (SELECT COUNT(*) FROM entries) + '
+            '(SELECT COUNT(*) FROM pending)').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        oldest = self._connection.execute(
+            'SELECT 0, key, last_used FROM entries UNION ALL '
+            'SELECT 1, uid, created FROM pending ORDER BY 3 LIMIT ?',
+            (count - self.max_entries,)).fetchall()
+        self._connection.executemany(
+            'DELETE FROM entries WHERE key = ?',
+            [(key,) for pending, key, _ in oldest if not pending])
+        self._connection.executemany(
+            'DELETE FROM pending WHERE uid = ?',
+            [(key,) for pending, key, _ in oldest if pending])
+
+    def remember(self, key, payload):
+        '''
+            Records a submitted translation: stored right away when already
+            completed, otherwise kept pending until :meth:`record` sees it
+            completed
+        '''
+        if payload.get('status') == COMPLETED_STATUS:
+            self.store(key, payload)
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO pending (uid, key, created) '
+                'VALUES (?, ?, ?)', (payload['uid'], key, self.clock()))
+            self._evict()
+
+    def record(self, payload):
+        '''
+            Stores a fetched translation payload if it completes a pending
+            submission, forgets the submission if it failed or was canceled
+        '''
+        status = payload.get('status')
+        if status in ABANDONED_STATUSES:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    'DELETE FROM pending WHERE uid = ?', (payload.get('uid'),))
+            return
+        if status != COMPLETED_STATUS:
+            return
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT key FROM pending WHERE uid = ?',
+                (payload.get('uid'),)).fetchone()
+            if row is None:
+                return
+            with self._connection:
+                self._connection.execute(
+                    'DELETE FROM pending WHERE uid = ?', (payload['uid'],))
+        self.store(row[0], payload)
+
+    def stats(self):
+        with self._lock:
+            entries = self._connection.execute(
+                'SELECT COUNT(*) FROM entries').fetchone()[0]
+            pending = self._connection.execute(
+                'SELECT COUNT(*) FROM pending').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'entries': entries,
+            'pending': pending,
+        }
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,147 @@
+import threading
+
+from six.moves.urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+# Collections whose second path segment is an object uid.
+_UID_COLLECTIONS = ('translation', 'mt_translation')
+
+
+def endpoint_name(url, api_url):
+    '''
+        Returns the path of ``url`` relative to ``api_url`` with query
+        strings dropped and uids replaced, e.g. ``translation/{uid}/``
+    '''
+    path = urlsplit(url).path
+    base = urlsplit(api_url).path
+    if path.startswith(base):
+        path = path[len(base):]
+    segments = [segment for segment in path.split('/') if segment]
+    if len(segments) > 1 and segments[0] in _UID_COLLECTIONS:
+        segments[1] = '{uid}'
+    return '/'.join(segments) + '/'
+
+
+class RequestEvent(object):
+    '''
+        Describes one API call to the instrumentation hooks. ``status``,
+        ``latency`` and ``response_bytes`` are only set once a response
+        arrives, ``error`` when the call raised.
+    '''
+    __slots__ = ('method', 'url', 'endpoint', 'status', 'latency',
+                 'request_bytes', 'response_bytes', 'retries', 'error')
+
+    def __init__(self, method, url, endpoint, request_bytes=0):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.request_bytes = request_bytes
+        self.status = None
+        self.latency = None
+        self.response_bytes = 0
+        self.retries = 0
+        self.error = None
+
+    def __repr__(self):
+        return "%s %s %s %.3fs" % (self.method, self.endpoint, self.status,
+                                   self.latency or 0)
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, labels[name])
+                             for name in sorted(labels))
+
+
+class MetricsCollector(object):
+    '''
+        Aggregates RequestEvents into per endpoint counters and latency
+        histograms, exported in the Prometheus text format
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='unbabel'):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._errors = {}
+        self._retries = {}
+        self._request_bytes = {}
+        self._response_bytes = {}
+        self._histograms = {}
+
+    def install(self, api):
+        api.add_hook('after_response', self.observe)
+        api.add_hook('on_error', self.observe)
+        return self
+
+    def observe(self, event):
+        key = (event.endpoint, event.method)
+        status = 'error' if event.status is None else str(event.status)
+        with self._lock:
+            request_key = key + (status,)
+            self._requests[request_key] = self._requests.get(
+                request_key, 0) + 1
+            if event.error is not None or event.status >= 400:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            self._retries[key] = self._retries.get(key, 0) + event.retries
+            self._request_bytes[key] = self._request_bytes.get(
+                key, 0) + event.request_bytes
+            self._response_bytes[key] = self._response_bytes.get(
+                key, 0) + event.response_bytes
+            if event.latency is not None:
+                counts, total, observed = self._histograms.get(
+                    key, ([0] * len(self.buckets), 0.0, 0))
+                for index, bound in enumerate(self.buckets):
+                    if event.latency <= bound:
+                        counts[index] += 1
+                self._histograms[key] = (counts, total + event.latency,
+                                         observed + 1)
+
+    def request_count(self, endpoint, method=None):
+        with self._lock:
+            return sum(count for (e, m, _), count in self._requests.items()
+                       if e == endpoint and method in (None, m))
+
+    def _counter(self, lines, name, help_text, values, label_names):
+        name = '%s_%s' % (self.prefix, name)
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s counter' % name)
+        for key in sorted(values):
+            lines.append('%s%s %s' % (
+                name, _labels(**dict(zip(label_names, key))), values[key]))
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            self._counter(lines, 'requests_total', 'API requests made.',
+                          self._requests, ('endpoint', 'method', 'status'))
+            self._counter(lines, 'request_errors_total',
+                          'API requests that failed or got a 4xx/5xx.',
+                          self._errors, ('endpoint', 'method'))
+            self._counter(lines, 'request_retries_total',
+                          'Retries of API requests.',
+                          self._retries, ('endpoint', 'method'))
+            self._counter(lines, 'request_bytes_total',
+                          'Bytes sent in request bodies.',
+                          self._request_bytes, ('endpoint', 'method'))
+            self._counter(lines, 'response_bytes_total',
+                          'Bytes received in response bodies.',
+                          self._response_bytes, ('endpoint', 'method'))
+            name = '%s_request_duration_seconds' % self.prefix
+            lines.append('# HELP %s API request latency, retries included.'
+                         % name)
+            lines.append('# TYPE %s histogram' % name)
+            for (endpoint, method) in sorted(self._histograms):
+                counts, total, count = self._histograms[(endpoint, method)]
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append('%s_bucket%s %s' % (name, _labels(
+                        endpoint=endpoint, method=method, le=repr(bound)),
+                        bucket_count))
+                lines.append('%s_bucket%s %s' % (name, _labels(
+                    endpoint=endpoint, method=method, le='+Inf'), count))
+                labels = _labels(endpoint=endpoint, method=method)
+                lines.append('%s_sum%s %s' % (name, labels, total))
+                lines.append('%s_count%s %s' % (name, labels, count))
+        return '\n'.join(lines) + '\n'
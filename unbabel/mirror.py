@@ -0,0 +1,191 @@
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from six.moves.urllib.parse import urlencode
+
+from unbabel.api import DEFAULT_PAGE_SIZE
+
+KINDS = ('translation', 'mt_translation')
+_COMMIT_EVERY = 1000
+
+_TIMESTAMP_RE = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}(?::\d{2})?)(?:\.(\d+))?'
+    r'(Z|[+-]\d{2}:?\d{2})?$')
+
+
+def parse_timestamp(value):
+    '''
+        Parses an ISO 8601 timestamp into an aware datetime, naive ones
+        being taken as UTC
+    '''
+    match = _TIMESTAMP_RE.match(value.strip())
+    if match is None:
+        raise ValueError('Invalid timestamp: {!r}'.format(value))
+    date, time, fraction, zone = match.groups()
+    if time.count(':') == 1:
+        time += ':00'
+    parsed = datetime.strptime(date + 'T' + time, '%Y-%m-%dT%H:%M:%S')
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+    offset = timedelta(0)
+    if zone and zone != 'Z':
+        sign = -1 if zone[0] == '-' else 1
+        digits = zone[1:].replace(':', '')
+        offset = sign * timedelta(hours=int(digits[:2]),
+                                  minutes=int(digits[2:]))
+    return parsed.replace(tzinfo=timezone(offset))
+
+
+class TranslationMirror(object):
+    """
+    Local SQLite copy of the translations and MT translations of an account.
+
+    :meth:`sync` only asks the server for objects modified since the
+    previous sync (``modified__gte`` the highest ``modified`` value seen)
+    and upserts them. Pages are ordered by ``modified`` and each one starts
+    from the last value seen rather than at an offset, so objects changing
+    during a sync cannot push others out of the listing. Reads are answered
+    locally through indexes on uid, status and language pair.
+    """
+
+    def __init__(self, api, path=':memory:'):
+        self.api = api
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS objects ('
+                'kind TEXT NOT NULL, uid TEXT NOT NULL, status TEXT, '
+                'source_language TEXT, target_language TEXT, modified TEXT, '
+                'payload TEXT NOT NULL, PRIMARY KEY (kind, uid))')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS objects_status '
+                'ON objects (kind, status)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS objects_language_pair '
+                'ON objects (kind, source_language, target_language)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS cursors ('
+                'kind TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def cursor(self, kind='translation'):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value FROM cursors WHERE kind = ?', (kind,)).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, kind, objects):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO objects (kind, uid, status, '
+                'source_language, target_language, modified, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(kind, obj['uid'], obj.get('status'),
+                  obj.get('source_language'), obj.get('target_language'),
+                  obj.get('modified'), json.dumps(obj)) for obj in objects])
+
+    def _set_cursor(self, kind, value):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO cursors (kind, value) VALUES (?, ?)',
+                (kind, value))
+
+    def _iter_changes(self, kind, cursor, page_size):
+        since, seen_at_since = cursor, 0
+        while True:
+            params = [('limit', page_size)]
+            if since:
+                params.append(('modified__gte', since))
+            if seen_at_since:
+                # Objects modified exactly at ``since`` were already read.
+                params.append(('offset', seen_at_since))
+            params.extend([('order_by', 'modified'), ('order_by', 'uid')])
+            page = self.api._fetch_page('{}{}/?{}'.format(
+                self.api.api_url, kind, urlencode(params)))
+            objects = page['objects']
+            for obj in objects:
+                yield obj
+            if not objects or not (page.get('meta') or {}).get('next'):
+                return
+            last = objects[-1].get('modified')
+            if last is None:
+                seen_at_since += len(objects)
+                continue
+            last_time = parse_timestamp(last)
+            at_last = sum(1 for obj in objects if obj.get('modified') and
+                          parse_timestamp(obj['modified']) == last_time)
+            if since and parse_timestamp(since) == last_time:
+                seen_at_since += at_last
+            else:
+                since, seen_at_since = last, at_last
+
+    def sync(self, kinds=KINDS, page_size=DEFAULT_PAGE_SIZE):
+        '''
+            Fetches the objects changed since the last sync and returns how
+            many were stored
+        '''
+        synced = 0
+        for kind in kinds:
+            cursor = self.cursor(kind)
+            latest = cursor
+            latest_time = cursor and parse_timestamp(cursor)
+            pending = []
+            for obj in self._iter_changes(kind, cursor, page_size):
+                pending.append(obj)
+                modified = obj.get('modified')
+                if modified:
+                    modified_time = parse_timestamp(modified)
+                    if latest is None or modified_time > latest_time:
+                        latest, latest_time = modified, modified_time
+                if len(pending) >= _COMMIT_EVERY:
+                    self._upsert(kind, pending)
+                    synced += len(pending)
+                    pending = []
+            if pending:
+                self._upsert(kind, pending)
+                synced += len(pending)
+            if latest is not None and latest != cursor:
+                self._set_cursor(kind, latest)
+        return synced
+
+    def _build(self, kind, payload):
+        obj = json.loads(payload)
+        if kind == 'mt_translation':
+            return self.api._build_mt_translation_object(obj)
+        return self.api._build_translation_object(obj)
+
+    def _select(self, kind, where, args):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT payload FROM objects WHERE kind = ? AND ' + where +
+                ' ORDER BY uid', (kind,) + args).fetchall()
+        return [self._build(kind, row[0]) for row in rows]
+
+    def get(self, uid, kind='translation'):
+        found = self._select(kind, 'uid = ?', (uid,))
+        return found[0] if found else None
+
+    def by_status(self, status, kind='translation'):
+        return self._select(kind, 'status = ?', (status,))
+
+    def by_language_pair(self, source_language, target_language,
+                         kind='translation'):
+        return self._select(
+            kind, 'source_language = ? AND target_language = ?',
+            (source_language, target_language))
+
+    def count(self, kind='translation', status=None):
+        query = 'SELECT COUNT(*) FROM objects WHERE kind = ?'
+        args = (kind,)
+        if status is not None:
+            query += ' AND status = ?'
+            args += (status,)
+        with self._lock:
+            return self._connection.execute(query, args).fetchone()[0]
+
+    def close(self):
+        self._connection.close()
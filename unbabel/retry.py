@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value):
+    '''
+        Returns the number of seconds asked by a Retry-After header, if any
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is tried again and how long to wait.
+
+    :param max_attempts: total number of attempts, the first one included.
+    :param backoff_factor: base delay in seconds, doubled on every attempt.
+    :param max_backoff: upper bound for a single delay.
+    :param retry_statuses: HTTP status codes worth retrying.
+    :param jitter: pick a random delay between 0 and the exponential bound
+    so that clients failing together do not retry together.
+    """
+
+    def __init__(self, max_attempts=4, backoff_factor=0.5, max_backoff=30.0,
+                 retry_statuses=DEFAULT_RETRY_STATUSES, jitter=True,
+                 sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.jitter = jitter
+        self.sleep = sleep
+
+    def should_retry(self, attempt, status_code=None):
+        '''
+            ``status_code`` is None when the request failed to connect
+        '''
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.max_backoff,
+                    self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class TokenBucket(object):
+    '''
+        Thread-safe token bucket allowing ``rate`` requests per second with
+        bursts of up to ``capacity`` requests
+    '''
+
+    def __init__(self, rate, capacity=None, clock=time.time,
+                 sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self):
+        now = self.clock()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if now < self._resume_at:
+            return self._resume_at - now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                wait = self._wait_time()
+            if not wait:
+                return
+            self.sleep(wait)
+
+    def pause(self, seconds):
+        '''
+            Holds every caller back for ``seconds``, e.g. after a 429
+        '''
+        with self._lock:
+            self._resume_at = max(self._resume_at, self.clock() + seconds)
+            self._tokens = 0
+
+
+_shared_rate_limiter = None
+
+
+def set_rate_limit(rate, capacity=None):
+    """
+    Limits every UnbabelApi of this process that has no rate limiter of its
+    own to ``rate`` requests per second. ``None`` removes the limit.
+    """
+    global _shared_rate_limiter
+    if rate is None:
+        _shared_rate_limiter = None
+    else:
+        _shared_rate_limiter = TokenBucket(rate, capacity)
+    return _shared_rate_limiter
+
+
+def get_rate_limiter():
+    return _shared_rate_limiter
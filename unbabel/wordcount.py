@@ -0,0 +1,72 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 100000
+
+_WORD_RE = re.compile(r"\w+(?:['\u2019-]\w+)*", re.UNICODE)
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class WordCountCache(object):
+    '''
+        Thread-safe LRU cache of server word counts keyed by text hash
+    '''
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts[key] = self._counts.pop(key)
+            return count
+
+    def set(self, key, count):
+        with self._lock:
+            self._counts.pop(key, None)
+            self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class WordCountEstimator(object):
+    '''
+        Offline word counter. Words are counted locally and scaled by the
+        ratio observed between the server counts and the local ones for the
+        texts it was calibrated with.
+    '''
+
+    def __init__(self):
+        self._local_total = 0
+        self._server_total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def local_count(text):
+        return len(_WORD_RE.findall(text))
+
+    def calibrate(self, text, server_count):
+        local = self.local_count(text)
+        with self._lock:
+            self._local_total += local
+            self._server_total += server_count
+
+    @property
+    def ratio(self):
+        if not self._local_total:
+            return 1.0
+        return float(self._server_total) / self._local_total
+
+    def estimate(self, text):
+        return int(round(self.local_count(text) * self.ratio))
@@ -1,14 +1,22 @@
 __author__ = 'joaograca'
 
-from bs4 import BeautifulSoup
+import hashlib
+import io
+import json
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
 import six
 
+_ATTRIBUTE_ENTITIES = {'"': '&quot;'}
+
 
-def generate_xliff(entry_dict):
+def generate_xliff(entry_dict, source_language="", target_language=""):
     """
     Given a dictionary with keys = ids
     and values equals to strings generates
     and xliff file to send to unbabel.
+    An iterable of (id, string) pairs is accepted as well.
 
     Example:
     {"123": "This is blue car",
@@ -29,20 +37,43 @@ def generate_xliff(entry_dict):
       </ xliff>
 
     """
-    entries = ""
-    for key, value in six.iteritems(entry_dict):
-        entries += create_trans_unit(key, value).strip() + "\n"
-    xliff_str = get_head_xliff().strip() + "\n" + entries + get_tail_xliff().strip()
-    return xliff_str
+    return "".join(iter_xliff(entry_dict, source_language, target_language))
+
+
+def _iter_entries(entries):
+    if hasattr(entries, "items"):
+        return six.iteritems(entries)
+    return iter(entries)
 
 
-def get_head_xliff():
+def iter_xliff(entries, source_language="", target_language=""):
+    """
+    Lazily generates the xliff document for a dictionary or an iterable of
+    (id, string) pairs, one chunk per trans-unit, so that documents of any
+    size are produced in constant memory.
+    """
+    yield get_head_xliff(source_language, target_language).strip() + "\n"
+    for key, value in _iter_entries(entries):
+        yield create_trans_unit(key, value).strip() + "\n"
+    yield get_tail_xliff().strip()
+
+
+def write_xliff(entries, fileobj, source_language="", target_language=""):
+    """
+    Streams the xliff document for ``entries`` into a text file-like object.
+    """
+    for chunk in iter_xliff(entries, source_language, target_language):
+        fileobj.write(chunk)
+
+
+def get_head_xliff(source_language="", target_language=""):
     return '''
 <xliff version = "1.2">
-<file original = "" source-language = "" target-language = "">
+<file original = "" source-language = "%s" target-language = "%s">
 <head> </head>
 <body>
-    '''
+    ''' % (escape(source_language, _ATTRIBUTE_ENTITIES),
+           escape(target_language, _ATTRIBUTE_ENTITIES))
 
 
 def get_tail_xliff():
@@ -60,20 +91,142 @@ def create_trans_unit(key, value):
         %s
     </source>
 </trans-unit>
-           ''' % (key, value)
+           ''' % (escape(six.text_type(key), _ATTRIBUTE_ENTITIES),
+                  escape(six.text_type(value)))
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _element_text(element):
+    return "".join(element.itertext()).strip()
+
+
+def iter_xliff_units(source):
+    """
+    Incrementally parses an xliff document from a path or a file-like object
+    and yields an (id, source, target) tuple per trans-unit, target being
+    None when the unit has not been translated. Processed elements are
+    discarded, so memory does not grow with the size of the document.
+    """
+    parents = []
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element.tag) != "trans-unit":
+            continue
+        unit_source = unit_target = None
+        for child in element:
+            name = _local_name(child.tag)
+            if name == "source" and unit_source is None:
+                unit_source = _element_text(child)
+            elif name == "target" and unit_target is None:
+                unit_target = _element_text(child)
+        yield element.get("id"), unit_source, unit_target
+        element.clear()
+        if parents:
+            parents[-1].remove(element)
 
 
 def get_dictionary_from_xliff(xliff_text, side="target"):
-    soup = BeautifulSoup(xliff_text, "html.parser")
-    trans_units = soup.find_all("trans-unit")
+    if isinstance(xliff_text, six.text_type):
+        xliff_text = xliff_text.encode("utf-8")
+    if isinstance(xliff_text, bytes):
+        xliff_text = io.BytesIO(xliff_text)
     result_dic = {}
-    for trans_unit in trans_units:
-        _id = trans_unit["id"]
-        if side == "target":
-            if trans_unit.target is None:
-                result_dic[_id] = trans_unit.source.text.strip()
-            else:
-                result_dic[_id] = trans_unit.target.text.strip()
+    for _id, source, target in iter_xliff_units(xliff_text):
+        if side == "target" and target is not None:
+            result_dic[_id] = target
+        else:
+            result_dic[_id] = source
+    return result_dic
+
+
+def source_hash(text):
+    return hashlib.sha1(six.text_type(text).encode("utf-8")).hexdigest()
+
+
+def build_manifest(entries):
+    """
+    Returns the manifest of a dictionary or iterable of (id, string) pairs:
+    a dictionary of id to the hash of its source string.
+    """
+    return dict((six.text_type(key), source_hash(value))
+                for key, value in _iter_entries(entries))
+
+
+def load_manifest(path):
+    with io.open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(six.text_type(json.dumps(manifest, sort_keys=True)))
+
+
+def _changed_entries(entries, manifest, new_manifest):
+    for key, value in _iter_entries(entries):
+        key = six.text_type(key)
+        digest = source_hash(value)
+        new_manifest[key] = digest
+        if manifest is None or manifest.get(key) != digest:
+            yield key, value
+
+
+def write_incremental_xliff(entries, fileobj, manifest=None,
+                            source_language="", target_language=""):
+    """
+    Streams into ``fileobj`` an xliff document holding only the entries that
+    are new or whose source changed since ``manifest``, the manifest of the
+    previous run (None to include everything).
+
+    :return: the manifest of ``entries``, to keep for the next run.
+    """
+    new_manifest = {}
+    write_xliff(_changed_entries(entries, manifest, new_manifest), fileobj,
+                source_language, target_language)
+    return new_manifest
+
+
+def generate_incremental_xliff(entries, manifest=None, source_language="",
+                               target_language=""):
+    """
+    Same as write_incremental_xliff but returns an (xliff, manifest) tuple.
+    """
+    out = six.StringIO()
+    new_manifest = write_incremental_xliff(entries, out, manifest,
+                                           source_language, target_language)
+    return out.getvalue(), new_manifest
+
+
+def merge_xliff_translations(previous_result, xliff_text, manifest):
+    """
+    Merges the translations of an incremental xliff into the result of the
+    previous run. Entries missing from ``manifest``, the manifest of the
+    current run, are dropped.
+
+    Units that came back without a target are not merged. They are removed
+    from ``manifest``, along with any other entry left without a
+    translation, so that the next run sends them again.
+
+    :return: the merged dictionary of id to translation.
+    """
+    if isinstance(xliff_text, six.text_type):
+        xliff_text = xliff_text.encode("utf-8")
+    if isinstance(xliff_text, bytes):
+        xliff_text = io.BytesIO(xliff_text)
+    result_dic = dict((key, value)
+                      for key, value in six.iteritems(previous_result)
+                      if key in manifest)
+    for _id, _, target in iter_xliff_units(xliff_text):
+        if target is None:
+            result_dic.pop(_id, None)
         else:
-            result_dic[_id] = trans_unit.source.text.strip()
+            result_dic[_id] = target
+    for key in [key for key in manifest if key not in result_dic]:
+        del manifest[key]
     return result_dic